@@ -1,6 +1,22 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401
+        from .db import configure_sqlite
+
+        connection_created.connect(configure_sqlite, dispatch_uid="app.db.configure_sqlite")
+
+        if settings.HEADCOUNT_PRELOAD and not settings.INFERENCE_SOCKET:
+            # Load the weights at import time. Under gunicorn (preload_app) this runs in the
+            # master, so the forked workers share the weight pages copy-on-write; the
+            # warm-up inference itself happens per worker in gunicorn.conf.py's post_fork.
+            from model.main import MyModel
+            MyModel.get_model()
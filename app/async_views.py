@@ -0,0 +1,202 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections
+from django.http import HttpResponse, HttpResponseNotAllowed
+from django.views.decorators.csrf import csrf_exempt
+from PIL import Image
+from rest_framework import exceptions
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.exceptions import ValidationError
+
+from model import ingest
+from . import dedupe, inference, rows as fast_rows, stats
+from .authentication import TokenAuthentication
+from .filters import filter_uploads
+from .models import ImageUpload, School
+from .pagination import KeysetPagination
+from .renderers import FastJSONRenderer
+from .serializers import ImageUploadSerializer
+
+User = get_user_model()
+
+# Async (ASGI) versions of the images/ upload and list endpoints, same request and
+# response formats as ImageUploadListCreateAPIView.
+#
+# Under ASGI, Django reads the request body on the event loop before calling the view,
+# so a slow mobile upload costs an await, not a thread. Queries go through the async
+# ORM; blocking work (multipart parsing, decoding, writing to storage, duplicate
+# checks, queueing inference) runs in a small thread pool of its own so it never
+# stalls the loop. Under WSGI these views still work, one request per thread.
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "ASYNC_UPLOAD_WORKERS", 8), thread_name_prefix="async-upload"
+        )
+    return _executor
+
+
+def _call(fn, *args, **kwargs):
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        close_old_connections()   # pool threads live outside Django's request cycle
+
+
+async def offload(fn, *args, **kwargs):
+    """Run blocking `fn` in the upload thread pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(_call, fn, *args, **kwargs))
+
+
+def json_response(payload, status=200):
+    return HttpResponse(FastJSONRenderer().render(payload), content_type="application/json", status=status)
+
+
+# ----------------------------------------------------------
+@csrf_exempt   # like APIView: CSRF is only checked for session-authenticated uploads, in _uploader
+async def image_list_create(request):
+    if request.method == "GET":
+        return await list_images(request)
+    if request.method == "POST":
+        return await upload_image(request)
+    return HttpResponseNotAllowed(["GET", "POST"])
+
+
+async def list_images(request):
+    uploads = ImageUpload.objects.select_related("user__school").defer("detections")
+    try:
+        uploads = filter_uploads(uploads, request.GET)
+        rows, next_cursor = await KeysetPagination().apaginate(uploads, request.GET)
+    except ValidationError as exc:
+        return json_response({
+            "success": False,
+            "message": "Invalid query parameters",
+            "errors": exc.detail
+        }, status=400)
+
+    return json_response({
+        "success": True,
+        "message": "Images fetched successfully",
+        "data": fast_rows.upload_list(rows),
+        "next_cursor": next_cursor
+    })
+
+
+# ----------------------------------------------------------
+def _parse(request):
+    # multipart parsing reads the spooled body (and may write big files to temp files)
+    return request.POST, request.FILES
+
+
+async def _uploader(request, user_id, errors):
+    """The user_id from the form, else the Bearer token's or session's user."""
+    if user_id:
+        user = await User.objects.select_related("school").filter(pk=user_id).afirst() if str(user_id).isdigit() else None
+        if user is None:
+            errors["user_id"] = [f'Invalid pk "{user_id}" - object does not exist.']
+        return user
+
+    authenticated = await offload(TokenAuthentication().authenticate, request)   # raises on a bad token
+    if authenticated is not None:
+        return authenticated[0]
+    user = await request.auser()
+    if not user.is_authenticated:
+        errors["user_id"] = ["A valid user_id is required"]
+        return None
+    SessionAuthentication().enforce_csrf(request)
+    return await User.objects.select_related("school").aget(pk=user.pk)
+
+
+def _prepare(image_file, tiling):
+    image = ingest.load_image(image_file, max_size=ingest.TILED_INPUT_SIZE if tiling else None)
+    return image, ingest.content_digest(image_file), dedupe.hash_to_hex(dedupe.dhash(image))
+
+
+def _store(upload, image_file):
+    # storage writes the file in chunks; the row is created afterwards through the async ORM
+    name = upload.image_file.field.generate_filename(upload, image_file.name)
+    upload.image_file.name = upload.image_file.storage.save(name, image_file, max_length=upload.image_file.field.max_length)
+
+
+def _after_save(upload, image, digest):
+    # same steps as a plain images/ upload; submit() only queues the forward pass
+    # (or counts inline with INFERENCE_ASYNC=0, which is why it is off the loop too)
+    stats.record_upload(upload)
+    original = dedupe.check_duplicate(upload, image=image)
+    inference.submit(upload, original=original, image=image, digest=digest)
+    return ImageUploadSerializer(upload).data
+
+
+async def upload_image(request):
+    data, files = await offload(_parse, request)
+    errors = {}
+    try:
+        uploader = await _uploader(request, data.get("user_id"), errors)
+    except exceptions.APIException as exc:   # bad token, or CSRF failure
+        return json_response({"success": False, "message": str(exc.detail)}, status=exc.status_code)
+
+    image_file = files.get("image_file")
+    if image_file is None:
+        errors["image_file"] = ["No file was submitted."]
+    try:
+        attendence = int(data.get("attendence", ""))
+        if attendence < 0:
+            raise ValueError
+    except ValueError:
+        errors["attendence"] = ["A valid non-negative integer is required."]
+    inference_mode = data.get("inference_mode", "")
+    if inference_mode and inference_mode not in dict(School.MODE_CHOICES):
+        errors["inference_mode"] = [f'"{inference_mode}" is not a valid choice.']
+
+    image = digest = image_hash = None
+    if not errors:
+        tiling = inference.resolve_tiling(uploader.school, inference_mode)
+        try:
+            image, digest, image_hash = await offload(_prepare, image_file, tiling)
+        except (OSError, Image.DecompressionBombError, SyntaxError):
+            errors["image_file"] = [
+                "Upload a valid image. The file you uploaded was either not an image or a corrupted image."
+            ]
+    if errors:
+        return json_response({
+            "success": False,
+            "message": "Upload failed",
+            "errors": errors
+        }, status=400)
+
+    upload = ImageUpload(
+        user=uploader,
+        original_filename=image_file.name,
+        attendence=attendence,
+        inference_mode=inference_mode,
+        image_hash=image_hash,   # set before the insert, see dedupe.UploadHashIndex
+    )
+    await offload(_store, upload, image_file)
+    try:
+        await upload.asave()
+    except Exception:
+        # no row points at the stored file, so nothing else would ever remove it
+        await offload(upload.image_file.storage.delete, upload.image_file.name)
+        raise
+    data = await offload(_after_save, upload, image, digest)
+
+    if upload.inference_status == ImageUpload.STATUS_PENDING:
+        return json_response({
+            "success": True,
+            "message": "Image uploaded successfully, head count is being processed",
+            "data": data
+        }, status=202)
+    return json_response({
+        "success": True,
+        "message": "Image uploaded successfully",
+        "data": data
+    }, status=201)
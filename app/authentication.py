@@ -0,0 +1,111 @@
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.utils.crypto import constant_time_compare, salted_hmac
+from rest_framework import authentication, exceptions
+from rest_framework.throttling import SimpleRateThrottle
+
+User = get_user_model()
+
+TOKEN_SALT = "app.authentication.token"
+
+
+# ----------------------------------------------------------
+# Signed, stateless tokens: {"u": user id, "p": fingerprint of the password hash}, HMAC'd with
+# SECRET_KEY and timestamped. Nothing is stored server side; changing the password (or
+# SECRET_KEY) invalidates every token issued before.
+
+def _password_fingerprint(user):
+    return salted_hmac(TOKEN_SALT, user.password).hexdigest()[:16]
+
+
+def token_max_age():
+    return getattr(settings, "AUTH_TOKEN_MAX_AGE", 7 * 24 * 3600)
+
+
+def issue_token(user):
+    return signing.dumps({"u": user.pk, "p": _password_fingerprint(user)}, salt=TOKEN_SALT)
+
+
+def read_token(token):
+    """Payload of a valid, unexpired token, else None. Pure CPU: one HMAC, no DB."""
+    try:
+        return signing.loads(token, salt=TOKEN_SALT, max_age=token_max_age())
+    except signing.BadSignature:   # also covers SignatureExpired
+        return None
+
+
+# ----------------------------------------------------------
+class PrincipalCache:
+    """Per-process cache of authenticated users (with their school) for AUTH_PRINCIPAL_TTL seconds.
+
+    Entries are dropped when the user or school is saved in this process
+    (app.signals); other processes see changes once the TTL runs out.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        ttl = getattr(settings, "AUTH_PRINCIPAL_TTL", 300)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is not None and now - entry[0] < ttl:
+            return entry[1]
+
+        user = User.objects.select_related("school").filter(pk=user_id, is_active=True).first()
+        with self._lock:
+            if user is None:
+                self._entries.pop(user_id, None)
+            else:
+                self._entries[user_id] = (now, user)
+        return user
+
+    def forget(self, user_id=None, school_id=None):
+        with self._lock:
+            if user_id is not None:
+                self._entries.pop(user_id, None)
+            if school_id is not None:
+                for uid in [uid for uid, (_, user) in self._entries.items() if user.school_id == school_id]:
+                    del self._entries[uid]
+
+
+principals = PrincipalCache()
+
+
+class TokenAuthentication(authentication.BaseAuthentication):
+    """`Authorization: Bearer <token>` with tokens from issue_token (returned by auth/login/)."""
+
+    keyword = "Bearer"
+
+    def authenticate(self, request):
+        header = authentication.get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed("Invalid token header")
+
+        payload = read_token(header[1].decode("ascii", "ignore"))
+        if payload is None:
+            raise exceptions.AuthenticationFailed("Invalid or expired token")
+        user = principals.get(payload["u"])
+        if user is None or not constant_time_compare(payload["p"], _password_fingerprint(user)):
+            raise exceptions.AuthenticationFailed("Invalid or expired token")
+        return user, header[1]
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+# ----------------------------------------------------------
+class LoginRateThrottle(SimpleRateThrottle):
+    # per client IP, kept in the default (in-process locmem) cache; rate from REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]["login"]
+    scope = "login"
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {"scope": self.scope, "ident": self.get_ident(request)}
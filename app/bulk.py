@@ -0,0 +1,167 @@
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from model import ingest
+
+from . import dedupe, inference, stats
+from .models import ImageUpload, Notification
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
+
+
+class BulkUploadError(Exception):
+    pass
+
+
+# ----------------------------------------------------------
+def _limits():
+    return (
+        getattr(settings, "BULK_UPLOAD_MAX_FILES", 100),
+        getattr(settings, "BULK_UPLOAD_MAX_FILE_SIZE", 20 * 1024 * 1024),
+    )
+
+
+def collect_files(files, archive=None):
+    """[(name, bytes)] from uploaded files and/or a zip archive, within the bulk limits."""
+    max_files, max_size = _limits()
+    items = []
+
+    def add(name, size, read):
+        if size > max_size:
+            raise BulkUploadError(f"'{name}' is larger than {max_size} bytes")
+        if len(items) >= max_files:
+            raise BulkUploadError(f"At most {max_files} images per request")
+        items.append((name, read()))
+
+    for f in files:
+        add(f.name, f.size, f.read)
+
+    if archive is not None:
+        try:
+            with zipfile.ZipFile(archive) as zf:
+                for info in zf.infolist():
+                    name = os.path.basename(info.filename)
+                    if info.is_dir() or name.startswith(".") or os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+                        continue
+                    add(name, info.file_size, lambda: zf.read(info))
+        except zipfile.BadZipFile:
+            raise BulkUploadError("archive is not a valid zip file")
+
+    if not items:
+        raise BulkUploadError("No images given (image_files or archive)")
+    return items
+
+
+# ----------------------------------------------------------
+def _prepare(name, data, max_size):
+    """Decode at model resolution, digest and dHash one file (runs in a worker thread)."""
+    try:
+        image = ingest.load_image(data, max_size=max_size)
+    except (OSError, Image.DecompressionBombError, SyntaxError) as exc:
+        return {"filename": name, "error": f"Not a readable image ({exc})"}
+    return {
+        "filename": name,
+        "data": data,
+        "image": image,
+        "digest": ingest.content_digest(ContentFile(data)),
+        "hash": dedupe.dhash(image),
+    }
+
+
+def _store(upload, data):
+    upload.image_file.save(upload.original_filename, ContentFile(data), save=False)
+
+
+def create_uploads(user, files, attendences, inference_mode=""):
+    """Store a batch of images for `user` and queue their head counts.
+
+    `files` is [(name, bytes)], `attendences` the matching attendance per file.
+    Returns one result dict per file, in order.
+    """
+    tiling = inference.resolve_tiling(getattr(user, "school", None), inference_mode)
+    max_size = ingest.TILED_INPUT_SIZE if tiling else None
+    workers = min(len(files), getattr(settings, "BULK_UPLOAD_WORKERS", 8))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        prepared = list(pool.map(lambda item: _prepare(item[0], item[1], max_size), files))
+
+    # duplicates: against stored uploads, then within the batch itself
+    max_distance = getattr(settings, "DUPLICATE_MAX_DISTANCE", 5)
+    batch_index = dedupe.HashIndex()
+    today = timezone.localdate()
+    uploads, items = [], []
+    for position, (item, attendence) in enumerate(zip(prepared, attendences)):
+        if "error" in item:
+            continue
+        original = dedupe.find_duplicate(item["hash"])
+        batch_original = None
+        if original is None:
+            matches = batch_index.search(item["hash"], max_distance)
+            batch_original = matches[0][1] if matches else None
+        batch_index.add(item["hash"], position)
+
+        item.update(original=original, batch_original=batch_original)
+        uploads.append(ImageUpload(
+            user=user,
+            school_id=user.school_id,
+            upload_date=today,
+            original_filename=item["filename"],
+            attendence=attendence,
+            image_hash=dedupe.hash_to_hex(item["hash"]),
+            duplicate_flag=original is not None or batch_original is not None,
+            inference_mode=inference_mode or "",
+            inference_status=ImageUpload.STATUS_PENDING,
+        ))
+        items.append((position, item))
+
+    if uploads:
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(_store, uploads, [item["data"] for _, item in items]))
+
+            with transaction.atomic():
+                ImageUpload.objects.bulk_create(uploads, batch_size=500)
+                stored = {position: upload for (position, _), upload in zip(items, uploads)}
+                alerts = []
+                for (position, item), upload in zip(items, uploads):
+                    original = item["original"]
+                    if original is None and item["batch_original"] is not None:
+                        original = stored[item["batch_original"]].pk
+                    item["original"] = original
+                    if original is not None:
+                        alerts.append(dedupe.duplicate_alert(upload, original))
+                Notification.objects.bulk_create(alerts)
+                stats.record_uploads(uploads)
+        except Exception:
+            # the rows never made it (or not all files did), don't leave the stored files behind
+            for upload in uploads:
+                if upload.image_file.name:
+                    upload.image_file.storage.delete(upload.image_file.name)
+            raise
+
+        # one batched pass through the counter (cache hits are filled in directly)
+        inference.submit_many(
+            uploads,
+            [item["original"] for _, item in items],
+            [item["image"] for _, item in items],
+            [item["digest"] for _, item in items],
+        )
+
+    results = [{"filename": item["filename"], "success": False, "error": item.get("error")} for item in prepared]
+    for (position, _), upload in zip(items, uploads):
+        results[position] = {
+            "filename": upload.original_filename,
+            "success": True,
+            "id": upload.pk,
+            "head_count": upload.head_count,
+            "duplicate_flag": upload.duplicate_flag,
+            "inference_status": upload.inference_status,
+        }
+    return results
@@ -0,0 +1,74 @@
+import hashlib
+import json
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponseNotModified
+from rest_framework.response import Response
+
+# Read-through cache for list endpoints that change rarely but are polled constantly.
+#
+# Every namespace has a version number in the cache; entries are keyed by it, so
+# invalidating is a single incr and stale entries are simply never looked up again
+# (they age out by TIMEOUT / MAX_ENTRIES). Versions start from the clock, so a
+# version key that was evicted never comes back with a number old entries used.
+
+
+def get_cache():
+    return caches[getattr(settings, "RESPONSE_CACHE_ALIAS", "responses")]
+
+
+def version(namespace):
+    cache = get_cache()
+    key = f"version:{namespace}"
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        value = cache.get(key)
+    return value
+
+
+def invalidate(*namespaces):
+    cache = get_cache()
+    for namespace in namespaces:
+        key = f"version:{namespace}"
+        try:
+            cache.incr(key)
+        except ValueError:   # never read (or evicted), nothing cached under it to hide
+            cache.add(key, int(time.time() * 1000), timeout=None)
+
+
+def invalidate_on_commit(*namespaces):
+    # after commit, otherwise a request in between could cache the old rows under the new version
+    transaction.on_commit(lambda: invalidate(*namespaces))
+
+
+# ----------------------------------------------------------
+def cache_key(request, namespace):
+    # one entry per endpoint + filters, query params in a stable order
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    return f"response:{namespace}:{version(namespace)}:{request.path}?{query}"
+
+
+def cached_response(request, namespace, build):
+    """Response for `build()` (the response payload), served from the cache with an ETag.
+
+    A matching If-None-Match gets a 304 without touching the database.
+    """
+    cache = get_cache()
+    key = cache_key(request, namespace)   # version read before building, so a concurrent invalidation wins
+    entry = cache.get(key)
+    if entry is None:
+        payload = build()
+        body = json.dumps(payload, sort_keys=True, default=str).encode()
+        entry = (f'"{hashlib.sha1(body).hexdigest()[:20]}"', payload)
+        cache.set(key, entry)
+
+    etag, payload = entry
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in [t.strip() for t in request.headers.get("If-None-Match", "").split(",")]:
+        return HttpResponseNotModified(headers=headers)
+    return Response(payload, headers=headers)
@@ -0,0 +1,228 @@
+import contextlib
+import fcntl
+import hashlib
+import os
+import threading
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from model import ingest
+
+from . import dedupe, inference, stats
+from .models import ImageUpload, UploadSession
+
+READ_SIZE = 64 * 1024
+
+
+class ChunkError(Exception):
+    pass
+
+
+class ChunkOffsetError(ChunkError):
+    def __init__(self, expected):
+        super().__init__(f"Expected offset {expected}")
+        self.expected = expected
+
+
+class ChunkConflictError(ChunkError):
+    # another request is writing or committing the same session
+    pass
+
+
+class _PartialFile(File):
+    # FileSystemStorage moves files exposing temporary_file_path() instead of copying them
+    def temporary_file_path(self):
+        return self.file.name
+
+
+# ----------------------------------------------------------
+# Running sha256 per session, so commit does not have to read the file again. Only lives in
+# this process: if a chunk lands on another worker (or after a restart) the offsets no longer
+# match and the prefix already on disk is rehashed once.
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+def _hasher(session, path):
+    with _hashers_lock:
+        entry = _hashers.pop(session.pk, None)
+    if entry is not None and entry[0] == session.received:
+        return entry[1]
+
+    digest = hashlib.sha256()
+    remaining = session.received
+    if remaining:
+        with open(path, "rb") as f:
+            while remaining:
+                data = f.read(min(READ_SIZE, remaining))
+                if not data:
+                    break
+                digest.update(data)
+                remaining -= len(data)
+    return digest
+
+
+def _keep_hasher(session, digest):
+    with _hashers_lock:
+        _hashers[session.pk] = (session.received, digest)
+
+
+def _forget(session):
+    with _hashers_lock:
+        _hashers.pop(session.pk, None)
+
+
+def max_size():
+    return getattr(settings, "CHUNKED_UPLOAD_MAX_SIZE", 50 * 1024 * 1024)
+
+
+@contextlib.contextmanager
+def _locked(path):
+    """Exclusive lock on the partial file: one chunk or commit per session at a time.
+
+    The lock is on the file, not on the session row, so a slow client never keeps
+    a database transaction (and SQLite's write lock) open while its bytes arrive.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise ChunkConflictError("Another request is writing to this upload session")
+        yield fd
+    finally:
+        os.close(fd)   # releases the lock
+
+
+
+# ----------------------------------------------------------
+def append_chunk(session, offset, stream, length):
+    """Append `length` bytes read from `stream` at `offset`; returns the new offset.
+
+    The request body is copied to the partial file in small reads, so a chunk is
+    never held in memory. If the client drops mid-chunk, whatever arrived is
+    kept and the next chunk resumes from there. No transaction is open while the
+    bytes arrive; the offset moves on with one conditional UPDATE at the end.
+    """
+    if session.status != UploadSession.STATUS_OPEN:
+        raise ChunkError("Upload session is already committed")
+
+    path = default_storage.path(session.partial_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _locked(path) as fd:
+        session.refresh_from_db(fields=["status", "received"])   # as the previous writer left it
+        if session.status != UploadSession.STATUS_OPEN:
+            raise ChunkError("Upload session is already committed")
+        if offset != session.received:
+            raise ChunkOffsetError(session.received)
+        limit = session.total_size if session.total_size is not None else max_size()
+        if offset + length > limit:
+            raise ChunkError(f"Chunk goes past the end of the upload ({limit} bytes)")
+
+        digest = _hasher(session, path)
+        written = 0
+        with os.fdopen(os.dup(fd), "r+b") as f:
+            f.seek(offset)
+            f.truncate()   # drop the tail of an earlier, half-written attempt
+            while written < length:
+                data = stream.read(min(READ_SIZE, length - written))
+                if not data:
+                    break
+                f.write(data)
+                digest.update(data)
+                written += len(data)
+
+        moved = UploadSession.objects.filter(
+            pk=session.pk, status=UploadSession.STATUS_OPEN, received=offset
+        ).update(received=offset + written, updated_at=timezone.now())
+        if not moved:   # committed or deleted meanwhile
+            raise ChunkConflictError("Upload session changed while the chunk was written")
+        session.received = offset + written
+        _keep_hasher(session, digest)
+    return session.received
+
+
+def abort(session):
+    _forget(session)
+    if default_storage.exists(session.partial_path):
+        default_storage.delete(session.partial_path)
+    session.delete()
+
+
+# ----------------------------------------------------------
+def commit(session):
+    """Turn a fully received session into an ImageUpload and start its head count.
+
+    The session is marked committing with a conditional UPDATE; hashing, decoding,
+    the duplicate check and queueing inference all run outside any transaction,
+    only the new rows are written in a short one. The partial file is moved (not
+    copied) into the image's place in storage. On failure the session is open
+    again, with its bytes back in place, so the commit can be retried.
+    """
+    if session.status != UploadSession.STATUS_OPEN:
+        raise ChunkError("Upload session is already committed")
+
+    path = default_storage.path(session.partial_path)
+    with _locked(path):
+        session.refresh_from_db(fields=["status", "received"])
+        if session.status != UploadSession.STATUS_OPEN:
+            raise ChunkError("Upload session is already committed")
+        if not session.received:
+            raise ChunkError("Nothing uploaded yet")
+        if session.total_size is not None and session.received != session.total_size:
+            raise ChunkError(f"Only {session.received} of {session.total_size} bytes received")
+        claimed = UploadSession.objects.filter(
+            pk=session.pk, status=UploadSession.STATUS_OPEN, received=session.received
+        ).update(status=UploadSession.STATUS_COMMITTING, updated_at=timezone.now())
+        if not claimed:
+            raise ChunkConflictError("Upload session changed, retry the commit")
+
+        try:
+            digest = _hasher(session, path).hexdigest()
+            if session.sha256 and session.sha256.lower() != digest:
+                raise ChunkError("sha256 does not match the uploaded bytes")
+
+            user = session.user
+            tiling = inference.resolve_tiling(user.school, session.inference_mode)
+            try:
+                image = ingest.load_image(path, max_size=ingest.TILED_INPUT_SIZE if tiling else None)
+            except (OSError, Image.DecompressionBombError, SyntaxError) as exc:
+                raise ChunkError(f"Not a readable image ({exc})")
+
+            upload = ImageUpload(
+                user=user,
+                original_filename=session.filename,
+                attendence=session.attendence,
+                inference_mode=session.inference_mode,
+                image_hash=dedupe.hash_to_hex(dedupe.dhash(image)),
+            )
+            with open(path, "rb") as f:
+                upload.image_file.save(session.filename, _PartialFile(f), save=False)
+            try:
+                with transaction.atomic():
+                    upload.save()
+                    session.status = UploadSession.STATUS_COMMITTED
+                    session.upload = upload
+                    session.save(update_fields=["status", "upload", "updated_at"])
+                    stats.record_upload(upload)
+            except Exception:
+                os.replace(upload.image_file.path, path)   # put the bytes back for a retry
+                raise
+        except Exception:
+            UploadSession.objects.filter(pk=session.pk, status=UploadSession.STATUS_COMMITTING).update(
+                status=UploadSession.STATUS_OPEN, updated_at=timezone.now()
+            )
+            session.status, session.upload = UploadSession.STATUS_OPEN, None
+            raise
+    _forget(session)
+
+    # same steps as a plain images/ upload; the row is in, so a failure here leaves
+    # a pending upload for process_pending_images, like images/ does
+    original = dedupe.check_duplicate(upload, image=image)
+    inference.submit(upload, original=original, image=image, digest=digest)
+    return upload
@@ -0,0 +1,34 @@
+from django.conf import settings
+
+# Per-connection SQLite tuning, connected to connection_created in AppConfig.ready().
+#
+# WAL lets readers carry on while one writer commits (the default rollback journal
+# locks the whole file for readers during every commit), synchronous=NORMAL only
+# fsyncs at checkpoints instead of every commit (still safe against corruption, a
+# power cut can lose the last few commits), the busy timeout makes a writer wait
+# for the lock instead of failing with "database is locked", and mmap serves reads
+# straight from the page cache.
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    db = connection.connection   # raw sqlite3 connection; connection.cursor() would recurse into connect()
+    db.execute(f"PRAGMA busy_timeout = {int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    if not connection.is_in_memory_db():
+        # journal_mode is stored in the file, so set it back explicitly (e.g. DELETE) to turn WAL off
+        db.execute(f"PRAGMA journal_mode = {settings.SQLITE_JOURNAL_MODE}")
+    db.execute(f"PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}")
+    db.execute(f"PRAGMA mmap_size = {int(settings.SQLITE_MMAP_SIZE)}")
+
+
+def describe(connection):
+    """One line about the database behind `connection`, for command output."""
+    if connection.vendor != "sqlite":
+        return f"{connection.vendor} {connection.settings_dict['NAME']} (CONN_MAX_AGE={connection.settings_dict['CONN_MAX_AGE']})"
+    with connection.cursor() as cursor:
+        pragmas = {}
+        for pragma in ("journal_mode", "synchronous", "busy_timeout", "mmap_size"):
+            cursor.execute(f"PRAGMA {pragma}")
+            pragmas[pragma] = cursor.fetchone()[0]
+    return f"sqlite {connection.settings_dict['NAME']} " + " ".join(f"{k}={v}" for k, v in pragmas.items())
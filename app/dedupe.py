@@ -0,0 +1,165 @@
+import threading
+from itertools import combinations
+
+import numpy as np
+from django.conf import settings
+from PIL import Image
+
+from . import stats
+from .models import ImageUpload, Notification
+
+HASH_BITS = 64
+
+
+# ----------------------------------------------------------
+def dhash(image, hash_size=8):
+    """64-bit difference hash of a PIL image (or path)."""
+    if isinstance(image, str):
+        image = Image.open(image)
+    if image.format == "JPEG":
+        # the hash only needs a tiny grayscale thumbnail, let libjpeg skip most of the decode
+        image.draft("L", (hash_size * 8, hash_size * 8))
+    pixels = np.asarray(image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hash_to_hex(value):
+    return f"{value:016x}"
+
+
+def hex_to_hash(value):
+    return int(value, 16)
+
+
+# ----------------------------------------------------------
+class HashIndex:
+    """Multi-index hashing over 64-bit perceptual hashes.
+
+    The hash is split into `chunks` 16-bit substrings, each with its own
+    lookup table. Two hashes within Hamming distance r must agree within
+    r // chunks bits on at least one substring (pigeonhole), so a query only
+    probes a handful of buckets instead of scanning every stored hash.
+    """
+
+    def __init__(self, chunks=4):
+        self.chunks = chunks
+        self.chunk_bits = HASH_BITS // chunks
+        self.mask = (1 << self.chunk_bits) - 1
+        self.tables = [{} for _ in range(chunks)]
+        self.size = 0
+
+    def _split(self, value):
+        return [(value >> (i * self.chunk_bits)) & self.mask for i in range(self.chunks)]
+
+    def _neighbours(self, chunk, radius):
+        yield chunk
+        for r in range(1, radius + 1):
+            for bits in combinations(range(self.chunk_bits), r):
+                flipped = chunk
+                for b in bits:
+                    flipped ^= 1 << b
+                yield flipped
+
+    def add(self, value, key):
+        for table, chunk in zip(self.tables, self._split(value)):
+            table.setdefault(chunk, []).append((value, key))
+        self.size += 1
+
+    def search(self, value, max_distance):
+        """Return [(distance, key)] for stored hashes within max_distance, closest first."""
+        radius = max_distance // self.chunks
+        seen = {}
+        for table, chunk in zip(self.tables, self._split(value)):
+            for probe in self._neighbours(chunk, radius):
+                for stored, key in table.get(probe, ()):
+                    if key in seen:
+                        continue
+                    distance = (stored ^ value).bit_count()
+                    if distance <= max_distance:
+                        seen[key] = distance
+        return sorted((d, k) for k, d in seen.items())
+
+
+# ----------------------------------------------------------
+class UploadHashIndex:
+    """Process-wide HashIndex over ImageUpload.image_hash.
+
+    Built lazily from the table, then kept current by pulling rows with a
+    higher id than the last one seen (other workers insert too). That only
+    works if rows are inserted with their hash already set: one filled in
+    later is behind the watermark by then and never gets indexed.
+    """
+
+    def __init__(self):
+        self.index = HashIndex()
+        self.last_id = 0
+        self.lock = threading.Lock()
+
+    def _sync(self):
+        rows = (
+            ImageUpload.objects.filter(pk__gt=self.last_id, image_hash__isnull=False)
+            .exclude(image_hash="")
+            .order_by("pk")
+            .values_list("pk", "image_hash")
+        )
+        for pk, image_hash in rows.iterator(chunk_size=10000):
+            try:
+                self.index.add(hex_to_hash(image_hash), pk)
+            except ValueError:   # not one of our hashes
+                pass
+            self.last_id = pk
+
+    def search(self, value, max_distance, exclude=None):
+        with self.lock:
+            self._sync()
+            return [(d, pk) for d, pk in self.index.search(value, max_distance) if pk != exclude]
+
+
+_upload_index = UploadHashIndex()
+
+
+def get_index():
+    return _upload_index
+
+
+# ----------------------------------------------------------
+def find_duplicate(value, exclude=None):
+    """pk of the closest stored upload within DUPLICATE_MAX_DISTANCE of hash `value`, or None."""
+    max_distance = getattr(settings, "DUPLICATE_MAX_DISTANCE", 5)
+    matches = get_index().search(value, max_distance, exclude=exclude)
+    if not matches:
+        return None
+    # the index never forgets deleted rows, so check which candidates still exist
+    alive = set(ImageUpload.objects.filter(pk__in=[pk for _, pk in matches]).values_list("pk", flat=True))
+    return next((pk for _, pk in matches if pk in alive), None)
+
+
+def duplicate_alert(upload, original):
+    return Notification(
+        image=upload,
+        user_id=upload.user_id,
+        type=Notification.TYPE_DUPLICATE_ALERT,
+        message=f"Image '{upload.original_filename}' looks like a duplicate of image #{original}",
+    )
+
+
+def check_duplicate(upload, image=None):
+    """Flag `upload` if a near-identical image was uploaded before and raise an alert.
+
+    Uploads are saved with image_hash set (see UploadHashIndex); it is only
+    computed here for a row that came without one.
+    """
+    update_fields = ["duplicate_flag"]
+    if not upload.image_hash:
+        upload.image_hash = hash_to_hex(dhash(image if image is not None else upload.image_file.path))
+        update_fields.append("image_hash")
+    original = find_duplicate(hex_to_hash(upload.image_hash), exclude=upload.pk)
+
+    upload.duplicate_flag = original is not None
+    upload.save(update_fields=update_fields)
+
+    if original is not None:
+        stats.record_duplicate(upload)
+        duplicate_alert(upload, original).save()
+    return original
@@ -0,0 +1,135 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from model import detections, ingest
+
+# name -> longest side in pixels; "labeled" is the original with the detected people boxed
+THUMBNAIL_SIZES = {"small": 160, "medium": 480, "large": 1024}
+LABELED_SIZE = 1600
+# bump to throw away every cached file after changing how they are drawn
+VERSION = 1
+
+
+class DerivativeCache:
+    """Directory of generated images with a total size cap.
+
+    Hits bump the file's mtime, so eviction (oldest mtime first) is roughly
+    LRU. The running size is only tracked in this process; every worker
+    evicts down to 90% of the cap when its own view says the cap is passed.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _scan(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.startswith("."):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    # ----------------------------------------------------------
+    def get(self, name):
+        path = os.path.join(self.directory, name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, name, data):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        # write + rename, so a concurrent reader never sees half a file
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._scan())
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+        return path
+
+    def _evict(self):
+        entries = sorted(self._scan())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._size = total
+
+    def stats(self):
+        entries = self._scan() if os.path.isdir(self.directory) else []
+        return {"files": len(entries), "bytes": sum(size for _, size, _ in entries), "max_bytes": self.max_bytes}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DerivativeCache(
+                getattr(settings, "DERIVATIVE_CACHE_DIR", None) or default_storage.path("derivatives"),
+                getattr(settings, "DERIVATIVE_CACHE_MAX_BYTES", 512 * 1024 * 1024),
+            )
+    return _cache
+
+
+# ----------------------------------------------------------
+def etag(upload, kind):
+    """Changes whenever the source file, the drawn detections (for "labeled") or the drawing code change."""
+    digest = hashlib.sha1(f"{VERSION}|{upload.image_file.name}|{kind}".encode())
+    if kind == "labeled":
+        digest.update(repr(detections.counting_rule()).encode())
+        digest.update(bytes(upload.detections or b""))
+    return digest.hexdigest()[:20]
+
+
+def render(upload, kind):
+    """JPEG bytes of a derivative. Labeled images are drawn from the stored detections, no inference."""
+    size = LABELED_SIZE if kind == "labeled" else THUMBNAIL_SIZES[kind]
+    with upload.image_file.open("rb") as f:
+        image = ingest.load_image(f, max_size=size)   # JPEG draft mode: decode at (close to) the target size
+    if kind == "labeled":
+        detections.draw(image, detections.unpack(upload.detections), *detections.counting_rule())
+
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=85, optimize=True)
+    return out.getvalue()
+
+
+def open_derivative(upload, kind):
+    """Open file of the derivative, generated and cached on first use."""
+    name = f"{upload.pk}-{kind}-{etag(upload, kind)}.jpg"
+    cache = get_cache()
+    path = cache.get(name)
+    if path is not None:
+        try:
+            return open(path, "rb")
+        except FileNotFoundError:   # evicted by another worker in between
+            pass
+    return open(cache.put(name, render(upload, kind)), "rb")
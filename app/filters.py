@@ -0,0 +1,77 @@
+from datetime import date
+
+from rest_framework.exceptions import ValidationError
+
+from .models import ImageUpload
+
+TRUE_VALUES = {"1", "true", "yes"}
+FALSE_VALUES = {"0", "false", "no"}
+
+
+def _int(params, name, errors):
+    value = params.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        errors[name] = "Must be an integer"
+
+
+def _date(params, name, errors):
+    value = params.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        errors[name] = "Must be a date (YYYY-MM-DD)"
+
+
+def filter_uploads(queryset, params):
+    """Apply the image list filters from query params.
+
+    school, user (or user_id), date, date_from, date_to, duplicate,
+    head_count_min, head_count_max, status. Dates go through the
+    denormalized upload_date column so (school, upload_date) and
+    (upload_date) indexes apply; user goes through (user, -upload_timestamp).
+    """
+    errors = {}
+    school = _int(params, "school", errors)
+    user = _int(params, "user", errors) or _int(params, "user_id", errors)
+    on_date = _date(params, "date", errors)
+    date_from = _date(params, "date_from", errors)
+    date_to = _date(params, "date_to", errors)
+    head_count_min = _int(params, "head_count_min", errors)
+    head_count_max = _int(params, "head_count_max", errors)
+
+    duplicate = params.get("duplicate")
+    if duplicate not in (None, "") and duplicate.lower() not in TRUE_VALUES | FALSE_VALUES:
+        errors["duplicate"] = "Must be true or false"
+
+    status = params.get("status")
+    if status and status not in dict(ImageUpload.STATUS_CHOICES):
+        errors["status"] = f"Must be one of {', '.join(dict(ImageUpload.STATUS_CHOICES))}"
+
+    if errors:
+        raise ValidationError(errors)
+
+    if school is not None:
+        queryset = queryset.filter(school_id=school)
+    if user is not None:
+        queryset = queryset.filter(user_id=user)
+    if on_date is not None:
+        queryset = queryset.filter(upload_date=on_date)
+    if date_from is not None:
+        queryset = queryset.filter(upload_date__gte=date_from)
+    if date_to is not None:
+        queryset = queryset.filter(upload_date__lte=date_to)
+    if duplicate not in (None, ""):
+        queryset = queryset.filter(duplicate_flag=duplicate.lower() in TRUE_VALUES)
+    if head_count_min is not None:
+        queryset = queryset.filter(head_count__gte=head_count_min)
+    if head_count_max is not None:
+        queryset = queryset.filter(head_count__lte=head_count_max)
+    if status:
+        queryset = queryset.filter(inference_status=status)
+    return queryset
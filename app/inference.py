@@ -0,0 +1,345 @@
+import base64
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from model.cache import ResultCache
+from model.detections import pack
+from model.ingest import content_digest
+from . import stats
+from .models import ImageUpload, School
+
+logger = logging.getLogger(__name__)
+
+# The ImageUpload rows themselves are the durable queue: anything left in
+# "pending" (e.g. after a restart) is picked up again by `process_pending_images`.
+# The executor below is only the in-process dispatcher for fresh uploads.
+
+_executor = None
+_executor_lock = threading.Lock()
+_result_cache = None
+_counter = None
+_queued_images = 0   # decoded images held by jobs queued or running on the executor
+_queued_images_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "INFERENCE_WORKERS", 1),
+                thread_name_prefix="inference",
+            )
+    return _executor
+
+
+def get_counter():
+    """Whatever counts heads in this process: the local model's batching engine, or the
+    inference daemon when INFERENCE_SOCKET is set (then torch is never imported here)."""
+    global _counter
+    with _executor_lock:
+        if _counter is None:
+            if getattr(settings, "INFERENCE_SOCKET", None):
+                from model.server import RemoteModel
+                _counter = RemoteModel(settings.INFERENCE_SOCKET)
+            else:
+                from model.main import MyModel
+                # concurrent workers share the model's micro-batcher, so their images go through one YOLO call
+                _counter = MyModel.get_model().get_engine()
+    return _counter
+
+
+def get_result_cache():
+    global _result_cache
+    with _executor_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache(
+                max_entries=getattr(settings, "RESULT_CACHE_SIZE", 10000),
+                path=getattr(settings, "RESULT_CACHE_PATH", None),
+            )
+    return _result_cache
+
+
+# ----------------------------------------------------------
+def resolve_tiling(school, mode=""):
+    """(tile_size, overlap) if sliced inference applies, else None. A blank mode means the school's."""
+    mode = mode or (school.inference_mode if school is not None else School.MODE_FULL)
+    if mode != School.MODE_TILED:
+        return None
+    if school is None:
+        return (640, 0.2)
+    return (school.tile_size, school.tile_overlap)
+
+
+def tiling_for(upload):
+    return resolve_tiling(upload.user.school, upload.inference_mode)
+
+
+def file_digest(field_file):
+    field_file.open("rb")
+    try:
+        return content_digest(field_file)
+    finally:
+        field_file.close()
+
+
+def cache_keys(upload, original=None, digest=None, tiling=None):
+    """Result cache keys for an upload: its byte hash, plus perceptual hashes for near-duplicates
+    when RESULT_CACHE_NEAR_DUPLICATES is on.
+
+    Pass `digest` when the bytes were already hashed from the upload buffer,
+    otherwise the stored file is read back. Tiled counts differ from
+    full-image ones, so they get their own keys.
+    """
+    keys = [f"sha256:{digest or file_digest(upload.image_file)}"]
+    if getattr(settings, "RESULT_CACHE_NEAR_DUPLICATES", False):
+        if upload.image_hash:
+            keys.append(f"dhash:{upload.image_hash}")
+        if original is not None:
+            original_hash = ImageUpload.objects.filter(pk=original).values_list("image_hash", flat=True).first()
+            if original_hash:
+                keys.append(f"dhash:{original_hash}")
+    if tiling is not None:
+        keys = [f"{key}:tiled{tiling[0]}x{tiling[1]}" for key in keys]
+    return keys
+
+
+def cache_value(head_count, detections):
+    return {"head_count": head_count, "detections": base64.b64encode(pack(detections)).decode()}
+
+
+def from_cache(value):
+    """(head_count, packed detections) from a cache entry; older entries only hold the count."""
+    if isinstance(value, dict):
+        return value["head_count"], base64.b64decode(value["detections"])
+    return value, None
+
+
+# ----------------------------------------------------------
+def claim(upload_ids, statuses=(ImageUpload.STATUS_PENDING,)):
+    """Mark those of `upload_ids` still in `statuses` as running, and return their ids.
+
+    Only the caller that claimed a row counts it, so the in-process executor and a
+    `process_pending_images --watch` poller never both run (and both count) one upload.
+    """
+    with transaction.atomic():
+        # row locks on PostgreSQL; SQLite's IMMEDIATE transaction already serialises claimers
+        ids = list(
+            ImageUpload.objects.select_for_update(skip_locked=True)
+            .filter(pk__in=upload_ids, inference_status__in=statuses)
+            .values_list("pk", flat=True)
+        )
+        ImageUpload.objects.filter(pk__in=ids).update(inference_status=ImageUpload.STATUS_RUNNING)
+    return ids
+
+
+def run_inference(upload_id, keys=None, image=None, statuses=(ImageUpload.STATUS_PENDING,)):
+    if not claim([upload_id], statuses):   # deleted, already counted, or someone else has it
+        return
+    upload = ImageUpload.objects.filter(pk=upload_id).first()
+    if upload is None:
+        return
+
+    try:
+        tiling = tiling_for(upload)
+        if keys is None:
+            keys = cache_keys(upload, tiling=tiling)
+        head_count, detections = get_counter().detect(
+            image if image is not None else upload.image_file.path, tiling
+        )
+    except Exception as exc:
+        logger.exception("Head count inference failed for image %s", upload_id)
+        ImageUpload.objects.filter(pk=upload_id).update(
+            inference_status=ImageUpload.STATUS_FAILED,
+            inference_error=str(exc)[:255],
+        )
+        return
+
+    get_result_cache().put(cache_value(head_count, detections), *keys)
+    with transaction.atomic():
+        updated = ImageUpload.objects.filter(pk=upload_id).update(
+            head_count=head_count,
+            detections=pack(detections),
+            inference_status=ImageUpload.STATUS_DONE,
+            inference_error="",
+        )
+        if updated:   # else deleted while it was counted, and post_delete already took it out of the stats
+            stats.record_head_count(upload, head_count, previous=upload.head_count)
+
+
+def _existing(uploads):
+    # those of `uploads` whose rows are still there; call inside the transaction that updated them
+    ids = set(ImageUpload.objects.filter(pk__in=[upload.pk for upload in uploads]).values_list("pk", flat=True))
+    return [upload for upload in uploads if upload.pk in ids]
+
+
+def run_inference_many(upload_ids, keys_list, images):
+    """Count a batch of uploads: all images go to the counter at once so they share forward passes,
+    and the results are written back with one bulk_update."""
+    uploads = ImageUpload.objects.select_related("user__school").in_bulk(claim(upload_ids))
+    counter = get_counter()
+
+    jobs = []
+    for upload_id, keys, image in zip(upload_ids, keys_list, images):
+        upload = uploads.get(upload_id)
+        if upload is None:
+            continue
+        source = image if image is not None else upload.image_file.path
+        jobs.append((upload, keys, counter.submit(source, tiling_for(upload))))
+
+    counted, failed = [], []
+    for upload, keys, future in jobs:
+        try:
+            head_count, detections = future.result()
+        except Exception as exc:
+            logger.exception("Head count inference failed for image %s", upload.pk)
+            upload.inference_status = ImageUpload.STATUS_FAILED
+            upload.inference_error = str(exc)[:255]
+            failed.append(upload)
+            continue
+        get_result_cache().put(cache_value(head_count, detections), *keys)
+        previous = upload.head_count
+        upload.head_count = head_count
+        upload.detections = pack(detections)
+        upload.inference_status = ImageUpload.STATUS_DONE
+        upload.inference_error = ""
+        counted.append((upload, head_count, previous))
+
+    with transaction.atomic():
+        ImageUpload.objects.bulk_update(
+            [upload for upload, _, _ in counted] + failed,
+            ["head_count", "detections", "inference_status", "inference_error"],
+            batch_size=500,
+        )
+        # only rows that still exist, as in run_inference
+        existing = {upload.pk for upload in _existing([upload for upload, _, _ in counted])}
+        counted = [entry for entry in counted if entry[0].pk in existing]
+        stats.record_head_counts([(upload, head_count) for upload, head_count, previous in counted if previous is None])
+        for upload, head_count, previous in counted:
+            if previous is not None:
+                stats.record_head_count(upload, head_count, previous)
+
+
+def _hold(images):
+    """Which of `images` a queued job may keep in memory: once INFERENCE_MAX_QUEUED_IMAGES
+    are held in this process the rest become None, and the worker reads the stored file."""
+    global _queued_images
+    limit = getattr(settings, "INFERENCE_MAX_QUEUED_IMAGES", 8)
+    held = []
+    with _queued_images_lock:
+        for image in images:
+            if image is not None and _queued_images < limit:
+                _queued_images += 1
+                held.append(image)
+            else:
+                held.append(None)
+    return held
+
+
+def _release(images):
+    global _queued_images
+    with _queued_images_lock:
+        _queued_images -= sum(image is not None for image in images)
+
+
+def _run_in_worker(upload_id, keys, image):
+    # worker threads get their own DB connection, make sure it doesn't go stale
+    close_old_connections()
+    try:
+        run_inference(upload_id, keys, image)
+    finally:
+        _release([image])
+        close_old_connections()
+
+
+def _run_many_in_worker(upload_ids, keys_list, images):
+    close_old_connections()
+    try:
+        run_inference_many(upload_ids, keys_list, images)
+    finally:
+        _release(images)
+        close_old_connections()
+
+
+# ----------------------------------------------------------
+def submit(upload, original=None, image=None, digest=None):
+    """Queue head counting for a freshly saved upload.
+
+    `image` / `digest` are the decoded image and sha256 taken from the
+    in-memory upload (see model.ingest), which saves re-reading the stored
+    file; without them the worker falls back to the file.
+
+    A result cache hit (same bytes, or a near-duplicate of `original`) fills
+    head_count straight away without a forward pass. In sync mode
+    (INFERENCE_ASYNC=0) the count is computed before returning. Either way
+    `upload` reflects the outcome once this returns.
+    """
+    keys = cache_keys(upload, original, digest, tiling_for(upload))
+    cached = get_result_cache().get(*keys)
+    if cached is not None:
+        head_count, detections = from_cache(cached)
+        # only while still pending: a poller may have claimed the row since it was saved
+        if ImageUpload.objects.filter(pk=upload.pk, inference_status=ImageUpload.STATUS_PENDING).update(
+            head_count=head_count, detections=detections, inference_status=ImageUpload.STATUS_DONE,
+        ):
+            upload.head_count, upload.detections = head_count, detections
+            upload.inference_status = ImageUpload.STATUS_DONE
+            stats.record_head_count(upload, head_count)
+        return
+
+    if not getattr(settings, "INFERENCE_ASYNC", True):
+        run_inference(upload.pk, keys, image)
+        upload.refresh_from_db()
+        return
+
+    # only hand the row to a worker once it is actually visible to other connections
+    upload_id = upload.pk
+    transaction.on_commit(lambda: get_executor().submit(_run_in_worker, upload_id, keys, *_hold([image])))
+
+
+def submit_many(uploads, originals, images, digests):
+    """submit() for a batch of freshly created uploads (lists aligned by position).
+
+    Cache hits are filled in at once; the rest are counted together by
+    run_inference_many, inline or in a single worker task.
+    """
+    misses, hits = [], []
+    for upload, original, image, digest in zip(uploads, originals, images, digests):
+        keys = cache_keys(upload, original, digest, tiling_for(upload))
+        cached = get_result_cache().get(*keys)
+        if cached is None:
+            misses.append((upload, keys, image))
+            continue
+        upload.head_count, upload.detections = from_cache(cached)
+        hits.append(upload)
+
+    if hits:
+        claimed = set(claim([upload.pk for upload in hits]))   # see submit()
+        hits = [upload for upload in hits if upload.pk in claimed]
+        for upload in hits:
+            upload.inference_status = ImageUpload.STATUS_DONE
+        with transaction.atomic():
+            ImageUpload.objects.bulk_update(hits, ["head_count", "detections", "inference_status"], batch_size=500)
+            stats.record_head_counts([(upload, upload.head_count) for upload in _existing(hits)])
+    if not misses:
+        return
+
+    upload_ids = [upload.pk for upload, _, _ in misses]
+    keys_list = [keys for _, keys, _ in misses]
+    images = [image for _, _, image in misses]
+    if not getattr(settings, "INFERENCE_ASYNC", True):
+        run_inference_many(upload_ids, keys_list, images)
+        refreshed = ImageUpload.objects.in_bulk(upload_ids)
+        for upload, _, _ in misses:
+            fresh = refreshed.get(upload.pk)
+            if fresh is not None:
+                upload.head_count = fresh.head_count
+                upload.inference_status = fresh.inference_status
+                upload.inference_error = fresh.inference_error
+        return
+
+    transaction.on_commit(lambda: get_executor().submit(_run_many_in_worker, upload_ids, keys_list, _hold(images)))
@@ -0,0 +1,97 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from app import rows
+from app.models import DailyReport, ImageUpload, Notification, School, User
+from app.renderers import FastJSONRenderer, orjson
+from app.serializers import (
+    DailyReportSerializer, ImageUploadListSerializer, ImageUploadSerializer, NotificationSerializer,
+    SchoolSerializer, UserSerializer,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows/sec of the DRF serializers against the app.rows fast path for the list endpoints, "
+        "and check both produce identical JSON. --seed adds synthetic rows inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Synthetic uploads + notifications to add first.")
+        parser.add_argument("--rounds", type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options["seed"]:
+                self.seed(options["seed"])
+            self.run(options["rounds"])
+            transaction.set_rollback(True)
+
+    def seed(self, n):
+        school = School.objects.create(name="bench school")
+        users = User.objects.bulk_create([
+            User(username=f"bench{i}", email=f"bench{i}@example.com", first_name="Bench", last_name=str(i), school=school)
+            for i in range(max(n // 100, 1))
+        ])
+        today = timezone.localdate()
+        uploads = ImageUpload.objects.bulk_create([
+            ImageUpload(
+                user=users[i % len(users)], school=school, upload_date=today, image_file=f"images/bench/{i}.jpg",
+                original_filename=f"{i}.jpg", attendence=30, head_count=28, duplicate_flag=False,
+                image_hash=f"{i:016x}", inference_status=ImageUpload.STATUS_DONE,
+            )
+            for i in range(n)
+        ], batch_size=1000)
+        Notification.objects.bulk_create([
+            Notification(user=upload.user, image=upload, type=Notification.TYPE_DUPLICATE_ALERT, message="bench")
+            for upload in uploads
+        ], batch_size=1000)
+
+    def cases(self):
+        uploads = ImageUpload.objects.select_related("user__school").order_by("-upload_timestamp", "-id")
+        return [
+            ("schools", lambda: SchoolSerializer(School.objects.all(), many=True).data, lambda: rows.schools()),
+            ("users", lambda: UserSerializer(User.objects.select_related("school"), many=True).data, lambda: rows.users()),
+            ("images (list)", lambda: ImageUploadListSerializer(uploads, many=True).data, lambda: rows.upload_list(uploads)),
+            ("images (full)", lambda: ImageUploadSerializer(uploads, many=True).data, lambda: rows.uploads(uploads)),
+            (
+                "notifications",
+                lambda: NotificationSerializer(Notification.objects.select_related("user__school", "image__user__school"), many=True).data,
+                lambda: rows.notifications(),
+            ),
+            ("reports", lambda: DailyReportSerializer(DailyReport.objects.all(), many=True).data, lambda: rows.reports()),
+        ]
+
+    def timed(self, build, rounds):
+        best, data = None, None
+        for _ in range(rounds):
+            started = time.perf_counter()
+            data = build()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, data
+
+    def run(self, rounds):
+        drf, fast = JSONRenderer(), FastJSONRenderer()
+        self.stdout.write(f"JSON encoder: {'orjson' if orjson else 'json (orjson not installed)'}")
+        for name, old, new in self.cases():
+            old_time, old_data = self.timed(old, rounds)
+            new_time, new_data = self.timed(new, rounds)
+            count = len(new_data)
+            if json.loads(drf.render(old_data)) != json.loads(fast.render(new_data)):
+                raise CommandError(f"{name}: fast path output differs from the serializer")
+            if not count:
+                self.stdout.write(f"{name:15} no rows")
+                continue
+
+            old_render, _ = self.timed(lambda: drf.render({"data": old_data}), rounds)
+            new_render, _ = self.timed(lambda: fast.render({"data": new_data}), rounds)
+            self.stdout.write(
+                f"{name:15} {count:7} rows  serializer {count / old_time:10.0f} rows/s  fast {count / new_time:10.0f} rows/s "
+                f"({old_time / new_time:4.1f}x)  render {old_render * 1000:7.1f} -> {new_render * 1000:6.1f} ms"
+            )
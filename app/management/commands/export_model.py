@@ -0,0 +1,54 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from model.export import compare_models, export_formats, export_weights, find_images
+from model.main import MyModel, weights_path
+
+
+class Command(BaseCommand):
+    help = "Export First_head_count_model.pt to ONNX/OpenVINO and validate its counts against PyTorch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=export_formats(), default="onnx")
+        parser.add_argument("--imgsz", type=int, default=640)
+        parser.add_argument("--images", default=os.path.join(settings.BASE_DIR, "images"),
+                            help="Folder of reference images to validate on.")
+        parser.add_argument("--limit", type=int, default=50)
+        parser.add_argument("--skip-export", action="store_true", help="Only validate already exported weights.")
+        parser.add_argument("--max-mismatches", type=int, default=0,
+                            help="Fail if more reference images than this get a different count.")
+
+    def handle(self, *args, **options):
+        backend = options["format"]
+
+        if options["skip_export"]:
+            target = weights_path(backend)
+            if not os.path.exists(target):
+                raise CommandError(f"No exported weights at {target}")
+        else:
+            self.stdout.write(f"Exporting {weights_path('torch')} to {backend}...")
+            target = export_weights(backend, imgsz=options["imgsz"])
+            self.stdout.write(f"Wrote {target}")
+
+        paths = find_images(options["images"], options["limit"])
+        if not paths:
+            raise CommandError(f"No reference images found in {options['images']}")
+
+        report = compare_models(MyModel(backend="torch"), MyModel(target, backend=backend), paths)
+        for row in report["rows"]:
+            flag = "" if row["diff"] == 0 else "  <-- mismatch"
+            self.stdout.write(f"{row['image']}: torch={row['reference']} {backend}={row['candidate']}{flag}")
+
+        self.stdout.write(
+            f"\n{len(paths)} images, {report['mismatches']} mismatches, "
+            f"mean abs count error {report['mean_abs_error']:.3f}\n"
+            f"torch {report['reference_latency'] * 1000:.1f} ms/img, "
+            f"{backend} {report['candidate_latency'] * 1000:.1f} ms/img "
+            f"({report['speedup']:.2f}x)"
+        )
+
+        if report["mismatches"] > options["max_mismatches"]:
+            raise CommandError(f"{backend} export disagrees with PyTorch on {report['mismatches']} image(s)")
+        self.stdout.write(self.style.SUCCESS(f"Set HEADCOUNT_BACKEND={backend} to serve with it."))
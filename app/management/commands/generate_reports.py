@@ -0,0 +1,152 @@
+import csv
+import os
+import time
+from datetime import date, timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from app.models import DailyReport, ImageUpload
+
+COLUMNS = [
+    "school_id", "school_name", "image_id", "user_id", "upload_timestamp", "original_filename",
+    "attendence", "head_count", "discrepancy", "duplicate_flag", "inference_status",
+]
+FIELDS = [
+    "school_id", "school__name", "id", "user_id", "upload_timestamp", "original_filename",
+    "attendence", "head_count", "duplicate_flag", "inference_status",
+]
+
+
+class CsvWriter:
+    def __init__(self, path):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    # polars builds each chunk, pyarrow appends it as a row group, so memory stays one chunk deep
+    def __init__(self, path):
+        try:
+            import polars as pl
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise CommandError(f"Parquet output needs polars and pyarrow ({exc})")
+        self.pl = pl
+        self.path = path
+        self.pq = pq
+        self.writer = None
+        # fixed dtypes, otherwise a chunk with only NULL head_counts would change the file schema
+        self.schema = dict(zip(COLUMNS, [
+            pl.Int64, pl.Utf8, pl.Int64, pl.Int64, pl.Utf8, pl.Utf8,
+            pl.Int64, pl.Int64, pl.Int64, pl.Boolean, pl.Utf8,
+        ]))
+
+    def write(self, rows):
+        table = self.pl.DataFrame(rows, schema=self.schema, orient="row").to_arrow()
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is None:   # no rows, still leave a valid (empty) file
+            self.pq.write_table(self.pl.DataFrame(schema=self.schema).to_arrow(), self.path)
+        else:
+            self.writer.close()
+
+
+WRITERS = {"csv": CsvWriter, "parquet": ParquetWriter}
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the daily report file (one row per upload, grouped by school) for a day or a date range "
+        "and record it in DailyReport. Rows are streamed in chunks, so memory use does not grow with the day."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", type=date.fromisoformat, default=None, help="Single day (default: today).")
+        parser.add_argument("--from", dest="date_from", type=date.fromisoformat, default=None)
+        parser.add_argument("--to", dest="date_to", type=date.fromisoformat, default=None)
+        parser.add_argument("--format", choices=sorted(WRITERS), default="csv")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument("--include-empty", action="store_true", help="Also write reports for days without uploads.")
+
+    def days(self, options):
+        if options["date_from"] or options["date_to"]:
+            start = options["date_from"] or options["date_to"]
+            end = options["date_to"] or timezone.localdate()
+        else:
+            start = end = options["date"] or timezone.localdate()
+        if end < start:
+            raise CommandError("--to is before --from")
+        return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+    def handle(self, *args, **options):
+        days = self.days(options)
+        if not options["include_empty"]:
+            active = set(
+                ImageUpload.objects.filter(upload_date__range=(days[0], days[-1]))
+                .values_list("upload_date", flat=True).distinct()
+            )
+            days = [day for day in days if day in active]
+
+        started = time.perf_counter()
+        total_rows = 0
+        for day in days:
+            rows, duplicates, name = self.write_day(day, options["format"], options["chunk_size"])
+            DailyReport.objects.update_or_create(
+                report_date=day,
+                defaults={
+                    "report_path": name,
+                    "total_uploads": rows,
+                    "total_duplicates": duplicates,
+                    "generated_at": timezone.now(),
+                },
+            )
+            total_rows += rows
+            self.stdout.write(f"{day}: {rows} uploads, {duplicates} duplicates -> {name}")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(days)} report(s), {total_rows} rows in {elapsed:.1f}s"
+            + (f" ({total_rows / elapsed:.0f} rows/s)" if elapsed else "")
+        ))
+
+    def write_day(self, day, fmt, chunk_size):
+        name = f"reports/{day:%Y/%m/%d}/daily_report_{day.isoformat()}.{fmt}"
+        path = default_storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        uploads = (
+            ImageUpload.objects.filter(upload_date=day)   # (upload_date) index
+            .order_by("school_id", "id")
+            .values_list(*FIELDS)
+        )
+        writer = WRITERS[fmt](path)
+        rows = duplicates = 0
+        chunk = []
+        try:
+            for school_id, school_name, pk, user_id, ts, filename, attendence, head_count, duplicate, status in uploads.iterator(chunk_size=chunk_size):
+                discrepancy = attendence - head_count if head_count is not None else None
+                chunk.append((school_id, school_name, pk, user_id, ts.isoformat(), filename,
+                              attendence, head_count, discrepancy, duplicate, status))
+                duplicates += bool(duplicate)
+                if len(chunk) >= chunk_size:
+                    writer.write(chunk)
+                    rows += len(chunk)
+                    chunk = []
+            if chunk:
+                writer.write(chunk)
+                rows += len(chunk)
+        finally:
+            writer.close()
+        return rows, duplicates, name
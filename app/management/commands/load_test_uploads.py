@@ -0,0 +1,135 @@
+import asyncio
+import io
+import time
+import uuid
+from collections import Counter
+from urllib.parse import urljoin, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+
+def _sample_jpeg():
+    image = Image.new("RGB", (1280, 960), (90, 120, 150))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def _multipart(fields, filename, content):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="image_file"; filename="{filename}"\r\n'
+        f"Content-Type: image/jpeg\r\n\r\n".encode() + content + b"\r\n"
+    )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return f"multipart/form-data; boundary={boundary}", b"".join(parts)
+
+
+async def _request(url, method, body=b"", content_type=None, headers=None, upload_rate=0):
+    """One HTTP/1.1 request over a fresh connection; returns the status code.
+
+    With `upload_rate` (bytes/s) the body is trickled out like from a slow phone link.
+    """
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    try:
+        lines = [f"{method} {parts.path}{'?' + parts.query if parts.query else ''} HTTP/1.1", f"Host: {parts.netloc}",
+                 "Connection: close", f"Content-Length: {len(body)}"]
+        if content_type:
+            lines.append(f"Content-Type: {content_type}")
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+
+        chunk = max(upload_rate // 10, 1024) if upload_rate else len(body) or 1
+        for offset in range(0, len(body), chunk):
+            writer.write(body[offset:offset + chunk])
+            await writer.drain()
+            if upload_rate:
+                await asyncio.sleep(chunk / upload_rate)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        await reader.read()   # until the server closes
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the sync (images/) and async (images/async/) upload or list endpoints of a running server "
+        "with many concurrent, optionally slow, clients and compare their tail latency. Serve the app through "
+        "ImageProblem.asgi for the async views to run on the event loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000/api/")
+        parser.add_argument("--paths", nargs="+", default=["images/", "images/async/"])
+        parser.add_argument("--list", action="store_true", help="GET the listings instead of uploading.")
+        parser.add_argument("--requests", type=int, default=200, help="Requests per path.")
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--upload-kbps", type=float, default=0, help="Per-client upload speed (0 = as fast as possible).")
+        parser.add_argument("--user-id", type=int, default=None, help="Uploader (or pass --token).")
+        parser.add_argument("--token", default=None, help="Bearer token from auth/login/.")
+        parser.add_argument("--attendence", type=int, default=30)
+        parser.add_argument("--image", default=None, help="JPEG to upload (default: a generated 1280x960 one).")
+
+    def handle(self, *args, **options):
+        if not options["list"] and options["user_id"] is None and not options["token"]:
+            raise CommandError("Uploads need --user-id or --token")
+        for path in options["paths"]:
+            url = urljoin(options["base_url"], path)
+            statuses, latencies, elapsed = asyncio.run(self.run(url, options))
+            self.report(path, statuses, sorted(latencies), elapsed)
+
+    async def run(self, url, options):
+        headers = {"Authorization": f"Bearer {options['token']}"} if options["token"] else {}
+        if options["list"]:
+            method, content_type, body = "GET", None, b""
+        else:
+            if options["image"]:
+                with open(options["image"], "rb") as f:
+                    content = f.read()
+            else:
+                content = _sample_jpeg()
+            fields = {"attendence": options["attendence"]}
+            if options["user_id"] is not None:
+                fields["user_id"] = options["user_id"]
+            method = "POST"
+            content_type, body = _multipart(fields, "load_test.jpg", content)
+        upload_rate = int(options["upload_kbps"] * 1000 / 8)
+
+        statuses, latencies = Counter(), []
+        semaphore = asyncio.Semaphore(options["concurrency"])
+
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    statuses[await _request(url, method, body, content_type, headers, upload_rate)] += 1
+                except (OSError, asyncio.IncompleteReadError, IndexError, ValueError) as exc:
+                    statuses[type(exc).__name__] += 1
+                    return
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(options["requests"])))
+        return statuses, latencies, time.perf_counter() - started
+
+    def report(self, path, statuses, latencies, elapsed):
+        outcome = ", ".join(f"{status} x{count}" for status, count in sorted(statuses.items(), key=str))
+        if not latencies:
+            self.stdout.write(f"{path}: no responses ({outcome})")
+            return
+
+        def pct(p):
+            return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000
+
+        self.stdout.write(
+            f"{path}: {len(latencies)} in {elapsed:.1f}s ({len(latencies) / elapsed:.1f}/s), "
+            f"p50 {pct(0.5):.0f} ms, p95 {pct(0.95):.0f} ms, p99 {pct(0.99):.0f} ms, max {latencies[-1] * 1000:.0f} ms [{outcome}]"
+        )
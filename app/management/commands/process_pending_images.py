@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.inference import run_inference
+from app.models import ImageUpload
+
+
+class Command(BaseCommand):
+    help = "Run head count inference for uploads still marked as pending (e.g. after a worker restart)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--retry-failed", action="store_true", help="Also re-run uploads that previously failed.")
+        parser.add_argument(
+            "--include-running", action="store_true",
+            help="Also re-run uploads left running by a process that died. Only when nothing else is counting.",
+        )
+        parser.add_argument("--watch", action="store_true", help="Keep polling the table for new pending uploads.")
+        parser.add_argument("--interval", type=float, default=2.0, help="Polling interval in seconds for --watch.")
+
+    def handle(self, *args, **options):
+        statuses = [ImageUpload.STATUS_PENDING]
+        if options["retry_failed"]:
+            statuses.append(ImageUpload.STATUS_FAILED)
+        if options["include_running"]:
+            statuses.append(ImageUpload.STATUS_RUNNING)
+
+        while True:
+            ids = list(
+                ImageUpload.objects.filter(inference_status__in=statuses)
+                .order_by("id")
+                .values_list("id", flat=True)
+            )
+            for upload_id in ids:
+                # claims the row first, so uploads the web workers' executor picked up meanwhile are skipped
+                run_inference(upload_id, statuses=statuses)
+            if ids:
+                self.stdout.write(f"Processed {len(ids)} pending image(s)")
+
+            if not options["watch"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app import chunked
+from app.models import UploadSession
+
+
+class Command(BaseCommand):
+    help = "Delete resumable upload sessions (and their partial files) that were abandoned, plus old committed ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=float, default=24, help="Open sessions idle for longer than this are removed.")
+        parser.add_argument("--keep-committed-days", type=float, default=7)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        # committing ones that old were left behind by a worker that died mid-commit
+        stale = UploadSession.objects.filter(
+            status__in=[UploadSession.STATUS_OPEN, UploadSession.STATUS_COMMITTING],
+            updated_at__lt=now - timedelta(hours=options["hours"]),
+        )
+        aborted = 0
+        for session in stale.iterator():
+            chunked.abort(session)
+            aborted += 1
+
+        # committed sessions only keep the upload link around for clients retrying the commit
+        committed, _ = UploadSession.objects.filter(
+            status=UploadSession.STATUS_COMMITTED,
+            updated_at__lt=now - timedelta(days=options["keep_committed_days"]),
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(f"Removed {aborted} stale and {committed} committed session(s)"))
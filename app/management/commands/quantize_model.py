@@ -0,0 +1,89 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.models import ImageUpload
+from model.export import compare_models, find_images
+from model.main import MyModel, weights_path
+from model.quantize import QUANTIZE_MODES, quantize_onnx, weights_size
+
+
+class Command(BaseCommand):
+    help = (
+        "Quantize the exported ONNX head count model to INT8 and check it against the float model: "
+        "mean absolute count error, speedup and weights size over a folder of images."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=QUANTIZE_MODES, default="static")
+        parser.add_argument("--calibration-size", type=int, default=200,
+                            help="Number of recent ImageUpload images used to calibrate static quantization.")
+        parser.add_argument("--imgsz", type=int, default=640)
+        parser.add_argument("--images", default=os.path.join(settings.BASE_DIR, "images"),
+                            help="Folder of images for the accuracy/speed comparison.")
+        parser.add_argument("--limit", type=int, default=100)
+        parser.add_argument("--reference", choices=["onnx", "torch"], default="onnx",
+                            help="Float model to compare against.")
+        parser.add_argument("--skip-quantize", action="store_true", help="Only run the comparison harness.")
+        parser.add_argument("--max-mae", type=float, default=0.5,
+                            help="Fail if the mean absolute count error exceeds this.")
+
+    def calibration_paths(self, size):
+        paths = []
+        uploads = ImageUpload.objects.order_by("-upload_timestamp").only("image_file")
+        for upload in uploads.iterator(chunk_size=500):
+            try:
+                path = upload.image_file.path
+            except (ValueError, NotImplementedError):   # no file / non-local storage
+                continue
+            if os.path.exists(path):
+                paths.append(path)
+            if len(paths) >= size:
+                break
+        return paths
+
+    def handle(self, *args, **options):
+        target = weights_path("onnx-int8")
+
+        if not options["skip_quantize"]:
+            paths = []
+            if options["mode"] == "static":
+                paths = self.calibration_paths(options["calibration_size"])
+                if not paths:
+                    raise CommandError("No stored ImageUpload images available for calibration, use --mode dynamic")
+                self.stdout.write(f"Calibrating on {len(paths)} stored upload(s)")
+            try:
+                quantize_onnx(options["mode"], paths, imgsz=options["imgsz"], target=target)
+            except (FileNotFoundError, ValueError) as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(f"Wrote {target}")
+        elif not os.path.exists(target):
+            raise CommandError(f"No quantized weights at {target}")
+
+        images = find_images(options["images"], options["limit"])
+        if not images:
+            raise CommandError(f"No images found in {options['images']}")
+
+        reference = options["reference"]
+        report = compare_models(MyModel(backend=reference), MyModel(target, backend="onnx-int8"), images)
+        for row in report["rows"]:
+            if row["diff"]:
+                self.stdout.write(f"{row['image']}: {reference}={row['reference']} int8={row['candidate']}")
+
+        float_size = weights_size(weights_path(reference))
+        int8_size = weights_size(target)
+        self.stdout.write(
+            f"\n{len(images)} images, {report['mismatches']} with a different count, "
+            f"mean abs count error {report['mean_abs_error']:.3f}\n"
+            f"{reference} {report['reference_latency'] * 1000:.1f} ms/img, "
+            f"int8 {report['candidate_latency'] * 1000:.1f} ms/img ({report['speedup']:.2f}x)\n"
+            f"weights {float_size / 1e6:.1f} MB -> {int8_size / 1e6:.1f} MB"
+        )
+
+        if report["mean_abs_error"] > options["max_mae"]:
+            raise CommandError(
+                f"INT8 model drifts by {report['mean_abs_error']:.3f} heads/image (limit {options['max_mae']}), "
+                "keep serving the float model"
+            )
+        self.stdout.write(self.style.SUCCESS("Counts within tolerance, set HEADCOUNT_BACKEND=onnx-int8 to serve with it."))
@@ -0,0 +1,17 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from app import stats
+
+
+class Command(BaseCommand):
+    help = "Recompute DailyUploadStats from ImageUpload, e.g. after a bulk import or to repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", type=date.fromisoformat, default=None)
+        parser.add_argument("--to", dest="date_to", type=date.fromisoformat, default=None)
+
+    def handle(self, *args, **options):
+        rows = stats.rebuild(options["date_from"], options["date_to"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} daily stats row(s)"))
@@ -0,0 +1,86 @@
+import time
+from datetime import date
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from app import inference, stats
+from app.models import ImageUpload
+from model.detections import count_packed, counting_rule
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute head_count from the stored detections under a (new) counting rule, without running "
+        "the model. Set HEADCOUNT_CONF / HEADCOUNT_PERSON_CLASS to the same values afterwards so new "
+        "uploads and labeled images follow the same rule. Uploads counted before detections were stored are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--conf", type=float, default=None, help="Confidence threshold (default: HEADCOUNT_CONF).")
+        parser.add_argument("--person-class", type=int, default=None, help="Class id counted (default: HEADCOUNT_PERSON_CLASS, else 0).")
+        parser.add_argument("--from", dest="date_from", type=date.fromisoformat, default=None)
+        parser.add_argument("--to", dest="date_to", type=date.fromisoformat, default=None)
+        parser.add_argument("--school", type=int, default=None)
+        parser.add_argument("--chunk-size", type=int, default=20000)
+        parser.add_argument("--dry-run", action="store_true", help="Only report how many counts would change.")
+
+    def handle(self, *args, **options):
+        default_class, default_conf = counting_rule()
+        conf = options["conf"] if options["conf"] is not None else default_conf
+        person_class = options["person_class"] if options["person_class"] is not None else default_class
+
+        uploads = ImageUpload.objects.filter(detections__isnull=False)
+        if options["date_from"]:
+            uploads = uploads.filter(upload_date__gte=options["date_from"])
+        if options["date_to"]:
+            uploads = uploads.filter(upload_date__lte=options["date_to"])
+        if options["school"] is not None:
+            uploads = uploads.filter(school_id=options["school"])
+
+        started = time.perf_counter()
+        compute = 0.0
+        rows = boxes = changed = 0
+        chunk = []
+        for row in uploads.order_by("pk").values_list("pk", "head_count", "detections").iterator(chunk_size=options["chunk_size"]):
+            chunk.append(row)
+            if len(chunk) >= options["chunk_size"]:
+                n, c, t = self.recount(chunk, person_class, conf, options["dry_run"])
+                boxes, changed, compute = boxes + n, changed + c, compute + t
+                rows += len(chunk)
+                chunk = []
+        if chunk:
+            n, c, t = self.recount(chunk, person_class, conf, options["dry_run"])
+            boxes, changed, compute = boxes + n, changed + c, compute + t
+            rows += len(chunk)
+
+        if changed and not options["dry_run"]:
+            # counters are sums over head_count, recompute them for the affected range
+            stats.rebuild(options["date_from"], options["date_to"])
+            # cached results carry counts made under the old rule
+            inference.get_result_cache().clear()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{rows} uploads, {boxes} boxes, {changed} count(s) {'would change' if options['dry_run'] else 'changed'} "
+            f"(class {person_class}, conf >= {conf}) in {elapsed:.1f}s"
+            + (f", counting at {boxes / compute / 1e6:.1f}M boxes/s" if compute else "")
+        ))
+        if changed and not options["dry_run"]:
+            self.stdout.write("Restart web workers to drop their in-memory result caches.")
+
+    def recount(self, chunk, person_class, conf, dry_run):
+        pks, previous, blobs = zip(*chunk)
+        started = time.perf_counter()
+        counts, boxes = count_packed(blobs, person_class, conf)
+        previous = np.array([-1 if hc is None else hc for hc in previous])
+        differs = np.flatnonzero(counts != previous)
+        compute = time.perf_counter() - started
+
+        if len(differs) and not dry_run:
+            ImageUpload.objects.bulk_update(
+                [ImageUpload(pk=pks[i], head_count=int(counts[i])) for i in differs],
+                ["head_count"],
+                batch_size=1000,
+            )
+        return boxes, len(differs), compute
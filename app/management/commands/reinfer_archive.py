@@ -0,0 +1,175 @@
+import contextlib
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from app import inference, stats
+from app.models import ImageUpload
+from model.main import weights_path
+from model.reinfer import init_worker, process_chunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-run head count inference over stored uploads (e.g. after shipping new weights) with a pool of "
+        "processes, one model each. Progress is checkpointed, so an interrupted run picks up where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        cpus = os.cpu_count() or 1
+        parser.add_argument("--processes", type=int, default=max(cpus // 2, 1))
+        parser.add_argument("--threads", type=int, default=None, help="Threads per process (default: cores / processes).")
+        parser.add_argument("--backend", default=None, help="torch / onnx / onnx-int8 / openvino")
+        parser.add_argument("--weights", default=None, help="Weights file (default: the backend's weights).")
+        parser.add_argument("--chunk-size", type=int, default=32, help="Uploads per task; also the decode prefetch depth.")
+        parser.add_argument("--batch-size", type=int, default=8, help="Images per forward pass.")
+        parser.add_argument("--from", dest="date_from", type=date.fromisoformat, default=None)
+        parser.add_argument("--to", dest="date_to", type=date.fromisoformat, default=None)
+        parser.add_argument("--school", type=int, default=None)
+        parser.add_argument("--checkpoint", default=os.path.join(settings.BASE_DIR, "reinfer_checkpoint.json"))
+        parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint.")
+        parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between progress lines.")
+
+    # ----------------------------------------------------------
+    def load_checkpoint(self, path, weights, restart):
+        if restart or not os.path.exists(path):
+            return {"weights": weights, "last_id": 0, "done": 0, "failed": 0}
+        with open(path) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("weights") != weights:
+            raise CommandError(
+                f"{path} belongs to a run with {checkpoint.get('weights')}; pass --restart to start over with {weights}"
+            )
+        return checkpoint
+
+    def save_checkpoint(self, path, checkpoint):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp, path)
+
+    def jobs(self, uploads, last_id, chunk_size):
+        # id-ordered keyset walk; tiling is resolved here, workers never see the DB
+        while True:
+            rows = list(uploads.filter(pk__gt=last_id).order_by("pk")[:chunk_size])
+            if not rows:
+                return
+            last_id = rows[-1].pk
+            yield last_id, [(u.pk, u.image_file.path, inference.tiling_for(u)) for u in rows]
+
+    # ----------------------------------------------------------
+    def handle(self, *args, **options):
+        weights = os.path.abspath(options["weights"] or weights_path(options["backend"] or os.environ.get("HEADCOUNT_BACKEND", "torch")))
+        checkpoint = self.load_checkpoint(options["checkpoint"], weights, options["restart"])
+
+        uploads = ImageUpload.objects.select_related("user__school").only(
+            "id", "image_file", "inference_mode", "user__school__inference_mode",
+            "user__school__tile_size", "user__school__tile_overlap",
+        )
+        if options["date_from"]:
+            uploads = uploads.filter(upload_date__gte=options["date_from"])
+        if options["date_to"]:
+            uploads = uploads.filter(upload_date__lte=options["date_to"])
+        if options["school"] is not None:
+            uploads = uploads.filter(school_id=options["school"])
+
+        remaining = uploads.filter(pk__gt=checkpoint["last_id"]).count()
+        processes = options["processes"]
+        threads = options["threads"] or max((os.cpu_count() or 1) // processes, 1)
+        self.stdout.write(
+            f"{remaining} uploads to go after id {checkpoint['last_id']} "
+            f"({processes} processes x {threads} threads, {os.path.basename(weights)})"
+        )
+
+        close_old_connections()   # nothing DB-related should leak into the workers
+        pool = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(weights, options["backend"], threads),
+        )
+        started = last_report = time.perf_counter()
+        done = failed = 0
+        pending = deque()   # (last id of chunk, future), in id order
+        jobs = self.jobs(uploads, checkpoint["last_id"], options["chunk_size"])
+        try:
+            while True:
+                # keep every process busy with one chunk queued behind it
+                while len(pending) < processes * 2:
+                    chunk = next(jobs, None)
+                    if chunk is None:
+                        break
+                    pending.append((chunk[0], pool.submit(process_chunk, chunk[1], options["batch_size"])))
+                if not pending:
+                    break
+
+                # the checkpoint only moves past chunks that are fully written, in id order
+                last_id, future = pending.popleft()
+                written, errors = self.write_results(future.result())
+                done += written
+                failed += errors
+                checkpoint.update(last_id=last_id, done=checkpoint["done"] + written, failed=checkpoint["failed"] + errors)
+                self.save_checkpoint(options["checkpoint"], checkpoint)
+
+                now = time.perf_counter()
+                if now - last_report >= options["report_every"]:
+                    last_report = now
+                    self.report(done + failed, remaining, now - started)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING(f"Interrupted, resume from id {checkpoint['last_id']} by running again"))
+            pool.shutdown(wait=False, cancel_futures=True)
+            return
+        except BrokenProcessPool as exc:   # a worker died (OOM kill, segfault in a backend, ...)
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise CommandError(
+                f"A worker process crashed ({exc}); resume from id {checkpoint['last_id']} by running again"
+            )
+        pool.shutdown()
+
+        # counts from the old weights are stale everywhere they were copied to
+        stats.rebuild(options["date_from"], options["date_to"])
+        inference.get_result_cache().clear()
+        with contextlib.suppress(FileNotFoundError):   # never written when there was nothing to do
+            os.remove(options["checkpoint"])
+        self.report(done + failed, remaining, time.perf_counter() - started)
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-counted {done} uploads, {failed} failed. Restart web workers to drop their in-memory result caches."
+        ))
+
+    def write_results(self, results):
+        updated, errors = [], 0
+        for upload_id, head_count, detections, error in results:
+            if error:
+                self.stderr.write(f"upload {upload_id}: {error}")
+                errors += 1
+                continue
+            updated.append(ImageUpload(
+                pk=upload_id,
+                head_count=head_count,
+                detections=detections,
+                inference_status=ImageUpload.STATUS_DONE,
+                inference_error="",
+            ))
+        ImageUpload.objects.bulk_update(updated, ["head_count", "detections", "inference_status", "inference_error"])
+        return len(updated), errors
+
+    def report(self, processed, total, elapsed):
+        if not total:
+            self.stdout.write("Nothing to do")
+            return
+        rate = processed / elapsed if elapsed else 0.0
+        if rate:
+            minutes, seconds = divmod(int((total - processed) / rate), 60)
+            eta = f"{minutes // 60}h{minutes % 60:02d}m{seconds:02d}s"
+        else:
+            eta = "?"
+        self.stdout.write(f"{processed}/{total} ({processed / total:.1%}) {rate:.1f} img/s, ETA {eta}")
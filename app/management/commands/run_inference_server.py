@@ -0,0 +1,37 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from model.main import MyModel
+from model.server import InferenceServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the head count model in a dedicated process. Web workers started with "
+        "HEADCOUNT_INFERENCE_SOCKET pointing at the socket send it images instead of loading the model."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--socket", default=os.environ.get("HEADCOUNT_INFERENCE_SOCKET", "/tmp/headcount.sock").split(",")[0])
+        parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads (default: all cores)")
+        parser.add_argument("--backend", default=None, help="torch / onnx / onnx-int8 / openvino")
+
+    def handle(self, *args, **options):
+        if options["threads"]:
+            import torch
+            torch.set_num_threads(options["threads"])
+
+        model = MyModel.get_model(backend=options["backend"])
+        model.warmup()
+
+        server = InferenceServer(options["socket"], model)
+        self.stdout.write(self.style.SUCCESS(f"Inference server ({model.backend}) listening on {options['socket']}"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if os.path.exists(options["socket"]):
+                os.unlink(options["socket"])
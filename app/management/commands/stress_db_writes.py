@@ -0,0 +1,126 @@
+import multiprocessing
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+
+from app import db, rows, stats
+from app.models import ImageUpload, School, User
+
+# Workers are forked processes, like gunicorn's, each with its own connection.
+
+
+def _write_uploads(worker, user_id, school_id, uploads, start, results):
+    # the database work of one upload request, then of its inference result
+    start.wait()
+    latencies, errors = [], []
+    for i in range(uploads):
+        started = time.perf_counter()
+        try:
+            upload = ImageUpload.objects.create(
+                user_id=user_id, school_id=school_id, image_file=f"images/stress/{worker}-{i}.jpg",
+                original_filename=f"{worker}-{i}.jpg", attendence=30, image_hash=f"{worker:08x}{i:08x}",
+            )
+            stats.record_upload(upload)
+            with transaction.atomic():
+                ImageUpload.objects.filter(pk=upload.pk).update(head_count=28, inference_status=ImageUpload.STATUS_DONE)
+                stats.record_head_count(upload, 28)
+        except OperationalError as exc:   # "database is locked"
+            errors.append(str(exc))
+            continue
+        latencies.append(time.perf_counter() - started)
+    connections.close_all()
+    results.put(("write", latencies, errors))
+
+
+def _read_lists(start, stop, results):
+    # list endpoint queries running alongside the writers
+    start.wait()
+    latencies, errors = [], []
+    uploads = ImageUpload.objects.select_related("user__school").defer("detections").order_by("-upload_timestamp", "-id")
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            rows.upload_list(uploads[:50])
+        except OperationalError as exc:
+            errors.append(str(exc))
+            continue
+        latencies.append(time.perf_counter() - started)
+    connections.close_all()
+    results.put(("read", latencies, errors))
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer the configured database with concurrent upload writes (and list reads) from several processes, "
+        "and report throughput, latency and lock errors. Rows are written under a throwaway school and removed after. "
+        "Run it again with SQLITE_JOURNAL_MODE=DELETE to compare against SQLite's defaults."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8, help="Writer processes.")
+        parser.add_argument("--uploads", type=int, default=100, help="Uploads per writer.")
+        parser.add_argument("--readers", type=int, default=2, help="Reader processes running list queries meanwhile.")
+        parser.add_argument("--keep", action="store_true", help="Leave the written rows in place.")
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            raise CommandError("An in-memory database can't be shared between processes")
+        self.stdout.write(db.describe(connection))
+
+        school = School.objects.create(name="stress_db_writes")
+        user = User.objects.create(username=f"stress_db_writes_{school.pk}", email="", school=school)
+        try:
+            writes, reads, elapsed = self.run(user, school, options)
+        finally:
+            if not options["keep"]:
+                ImageUpload.objects.filter(school=school).delete()   # post_delete takes them out of the daily stats
+                user.delete()
+                school.delete()
+
+        self.report("writes", sorted(writes[0]), writes[1], elapsed)
+        self.report("reads", sorted(reads[0]), reads[1], elapsed)
+        if writes[1] or reads[1]:
+            self.stdout.write(self.style.WARNING(f"first error: {(writes[1] or reads[1])[0]}"))
+
+    def run(self, user, school, options):
+        context = multiprocessing.get_context("fork")
+        connections.close_all()   # each child opens its own
+        start, stop, results = context.Event(), context.Event(), context.Queue()
+        writers = [
+            context.Process(target=_write_uploads, args=(w, user.pk, school.pk, options["uploads"], start, results))
+            for w in range(options["workers"])
+        ]
+        readers = [context.Process(target=_read_lists, args=(start, stop, results)) for _ in range(options["readers"])]
+        for process in writers + readers:
+            process.start()
+
+        started = time.perf_counter()
+        start.set()
+        outcomes = [results.get() for _ in writers]
+        elapsed = time.perf_counter() - started
+        stop.set()
+        outcomes += [results.get() for _ in readers]
+        for process in writers + readers:
+            process.join()
+
+        merged = {"write": ([], []), "read": ([], [])}   # kind -> (latencies, errors)
+        for kind, latencies, errors in outcomes:
+            merged[kind][0].extend(latencies)
+            merged[kind][1].extend(errors)
+        return merged["write"], merged["read"], elapsed
+
+    def report(self, label, latencies, errors, elapsed):
+        if not latencies:
+            self.stdout.write(f"{label}: none completed, {len(errors)} errors")
+            return
+
+        def pct(p):
+            return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000
+
+        self.stdout.write(
+            f"{label}: {len(latencies)} in {elapsed:.1f}s ({len(latencies) / elapsed:.0f}/s), "
+            f"p50 {pct(0.5):.1f} ms, p95 {pct(0.95):.1f} ms, p99 {pct(0.99):.1f} ms, max {latencies[-1] * 1000:.1f} ms, "
+            f"mean {statistics.fmean(latencies) * 1000:.1f} ms, {len(errors)} errors"
+        )
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:46
+
+from django.db import migrations, models
+
+
+def mark_counted_uploads_done(apps, schema_editor):
+    # rows counted inline before the queue existed are already finished
+    ImageUpload = apps.get_model('app', 'ImageUpload')
+    ImageUpload.objects.filter(head_count__isnull=False).update(inference_status='done')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageupload',
+            name='inference_error',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='imageupload',
+            name='inference_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.RunPython(mark_counted_uploads_done, migrations.RunPython.noop),
+    ]
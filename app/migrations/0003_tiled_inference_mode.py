@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_imageupload_inference_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageupload',
+            name='inference_mode',
+            field=models.CharField(blank=True, choices=[('full', 'Full image'), ('tiled', 'Tiled (large / crowded halls)')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='school',
+            name='inference_mode',
+            field=models.CharField(choices=[('full', 'Full image'), ('tiled', 'Tiled (large / crowded halls)')], default='full', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='school',
+            name='tile_overlap',
+            field=models.FloatField(default=0.2),
+        ),
+        migrations.AddField(
+            model_name='school',
+            name='tile_size',
+            field=models.PositiveIntegerField(default=640),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_tiled_inference_mode'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='imageupload',
+            index=models.Index(fields=['-upload_timestamp', '-id'], name='imageupload_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import TruncDate
+
+
+def backfill_school_and_date(apps, schema_editor):
+    ImageUpload = apps.get_model('app', 'ImageUpload')
+    User = apps.get_model('app', 'User')
+    # set-based, so it is two UPDATE statements however big the table is
+    ImageUpload.objects.filter(school__isnull=True).update(
+        school_id=Subquery(User.objects.filter(pk=OuterRef('user_id')).values('school_id')[:1])
+    )
+    ImageUpload.objects.filter(upload_date__isnull=True).update(upload_date=TruncDate('upload_timestamp'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_imageupload_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageupload',
+            name='school',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='image_uploads', to='app.school'),
+        ),
+        migrations.AddField(
+            model_name='imageupload',
+            name='upload_date',
+            field=models.DateField(null=True),
+        ),
+        migrations.RunPython(backfill_school_and_date, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='imageupload',
+            index=models.Index(fields=['user', '-upload_timestamp'], name='imageupload_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imageupload',
+            index=models.Index(fields=['school', 'upload_date'], name='imageupload_school_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imageupload',
+            index=models.Index(fields=['upload_date'], name='imageupload_date_idx'),
+        ),
+    ]
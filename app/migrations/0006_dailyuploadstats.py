@@ -0,0 +1,60 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Abs, Coalesce
+
+
+def backfill_daily_stats(apps, schema_editor):
+    ImageUpload = apps.get_model('app', 'ImageUpload')
+    DailyUploadStats = apps.get_model('app', 'DailyUploadStats')
+
+    counted = Q(head_count__isnull=False)
+    aggregates = dict(
+        total_uploads=Count('id'),
+        total_duplicates=Count('id', filter=Q(duplicate_flag=True)),
+        total_attendance=Coalesce(Sum('attendence'), 0),
+        counted_uploads=Count('id', filter=counted),
+        total_head_count=Coalesce(Sum('head_count', filter=counted), 0),
+        total_discrepancy=Coalesce(Sum(Abs(F('attendence') - F('head_count')), filter=counted), 0),
+    )
+    uploads = ImageUpload.objects.exclude(upload_date__isnull=True)
+    rows = [
+        DailyUploadStats(date=row.pop('upload_date'), school_id=row.pop('school_id'), **row)
+        for row in uploads.exclude(school__isnull=True).values('upload_date', 'school_id').annotate(**aggregates).order_by()
+    ]
+    rows += [
+        DailyUploadStats(date=row.pop('upload_date'), school_id=None, **row)
+        for row in uploads.values('upload_date').annotate(**aggregates).order_by()
+    ]
+    DailyUploadStats.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_imageupload_school_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyUploadStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('total_uploads', models.IntegerField(default=0)),
+                ('total_duplicates', models.IntegerField(default=0)),
+                ('total_attendance', models.IntegerField(default=0)),
+                ('counted_uploads', models.IntegerField(default=0)),
+                ('total_head_count', models.IntegerField(default=0)),
+                ('total_discrepancy', models.IntegerField(default=0)),
+                ('school', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='app.school')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'school'), name='dailyuploadstats_date_school_uniq'), models.UniqueConstraint(condition=models.Q(('school__isnull', True)), fields=('date',), name='dailyuploadstats_date_all_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:00
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_dailyuploadstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=512)),
+                ('total_size', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('received', models.PositiveBigIntegerField(default=0)),
+                ('sha256', models.CharField(blank=True, default='', max_length=64)),
+                ('attendence', models.PositiveIntegerField()),
+                ('inference_mode', models.CharField(blank=True, choices=[('full', 'Full image'), ('tiled', 'Tiled (large / crowded halls)')], default='', max_length=10)),
+                ('status', models.CharField(choices=[('open', 'Open'), ('committed', 'Committed')], default='open', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('upload', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload_session', to='app.imageupload')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='uploadsession_stale_idx')],
+            },
+        ),
+    ]
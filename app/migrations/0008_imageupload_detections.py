@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageupload',
+            name='detections',
+            field=models.BinaryField(null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:26
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def clamp_tiling(apps, schema_editor):
+    # rows saved before the bounds existed
+    School = apps.get_model('app', 'School')
+    School.objects.filter(tile_size__lt=64).update(tile_size=64)
+    School.objects.filter(tile_size__gt=4096).update(tile_size=4096)
+    School.objects.filter(tile_overlap__lt=0).update(tile_overlap=0.0)
+    School.objects.filter(tile_overlap__gt=0.8).update(tile_overlap=0.8)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_imageupload_running_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='school',
+            name='tile_overlap',
+            field=models.FloatField(default=0.2, validators=[django.core.validators.MinValueValidator(0.0), django.core.validators.MaxValueValidator(0.8)]),
+        ),
+        migrations.AlterField(
+            model_name='school',
+            name='tile_size',
+            field=models.PositiveIntegerField(default=640, validators=[django.core.validators.MinValueValidator(64), django.core.validators.MaxValueValidator(4096)]),
+        ),
+        migrations.RunPython(clamp_tiling, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_school_tile_bounds'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='status',
+            field=models.CharField(choices=[('open', 'Open'), ('committing', 'Committing'), ('committed', 'Committed')], default='open', max_length=20),
+        ),
+    ]
@@ -1,12 +1,27 @@
+import uuid
+
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
 
 # ----------------------------------School-------------------------------------------------
 
 class School(models.Model):
+    MODE_FULL = "full"
+    MODE_TILED = "tiled"
+    MODE_CHOICES = [
+        (MODE_FULL, "Full image"),
+        (MODE_TILED, "Tiled (large / crowded halls)"),
+    ]
+
     name = models.CharField(max_length=255)
     address = models.TextField(blank=True)
+    inference_mode = models.CharField(max_length=10, choices=MODE_CHOICES, default=MODE_FULL)
+    # bounded so tile_grid stays at a sane number of windows per photo
+    tile_size = models.PositiveIntegerField(default=640, validators=[MinValueValidator(64), MaxValueValidator(4096)])
+    tile_overlap = models.FloatField(default=0.2, validators=[MinValueValidator(0.0), MaxValueValidator(0.8)])
 
 
     class Meta:
@@ -47,8 +62,21 @@ class User(AbstractUser):
 # ---------------------------------- ImageUpload -------------------------------------------------
 
 class ImageUpload(models.Model):
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"   # claimed by one inference worker (app.inference.claim)
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="image_uploads")
+    # denormalized from user.school / upload_timestamp so per-school and per-day filters can use an index
+    school = models.ForeignKey(School, null=True, on_delete=models.CASCADE, related_name="image_uploads", db_index=False)
+    upload_date = models.DateField(null=True)
     image_file = models.ImageField(upload_to="images/%Y/%m/%d/")
     upload_timestamp = models.DateTimeField(auto_now_add=True)
     original_filename = models.CharField(max_length=512)
@@ -56,17 +84,76 @@ class ImageUpload(models.Model):
     image_hash = models.CharField(max_length=128, blank=True, null=True, db_index=True)
     attendence = models.PositiveIntegerField()
     head_count = models.PositiveIntegerField(null=True)
+    inference_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    inference_error = models.CharField(max_length=255, blank=True, default="")
+    inference_mode = models.CharField(max_length=10, choices=School.MODE_CHOICES, blank=True, default="")   # blank = school's mode
+    detections = models.BinaryField(null=True, editable=False)   # packed boxes (model.detections), for overlays / recounts
     
     class Meta:
         ordering = ["-upload_timestamp"]
         indexes = [
             models.Index(fields=["image_hash"]),
+            models.Index(fields=["-upload_timestamp", "-id"], name="imageupload_keyset_idx"),   # cursor pagination
+            models.Index(fields=["user", "-upload_timestamp"], name="imageupload_user_recent_idx"),
+            models.Index(fields=["school", "upload_date"], name="imageupload_school_date_idx"),
+            models.Index(fields=["upload_date"], name="imageupload_date_idx"),
         ]
     
+    def save(self, *args, **kwargs):
+        if self.upload_date is None:
+            self.upload_date = timezone.localdate(self.upload_timestamp) if self.upload_timestamp else timezone.localdate()
+        if self.school_id is None and self.user_id is not None:
+            self.school_id = self.user.school_id
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.original_filename} ({self.user})"
     
 
+# ---------------------------------- UploadSession -------------------------------------------------
+
+class UploadSession(models.Model):
+    """A resumable (chunked) upload in progress; see app.chunked.
+
+    Chunks are appended to `partial_path` in storage, `received` is the next
+    expected offset. Committing turns the file into an ImageUpload.
+    """
+
+    STATUS_OPEN = "open"
+    STATUS_COMMITTING = "committing"
+    STATUS_COMMITTED = "committed"
+    STATUS_CHOICES = [
+        (STATUS_OPEN, "Open"),
+        (STATUS_COMMITTING, "Committing"),
+        (STATUS_COMMITTED, "Committed"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="upload_sessions")
+    filename = models.CharField(max_length=512)
+    total_size = models.PositiveBigIntegerField(null=True, blank=True)   # unknown until commit if not given
+    received = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True, default="")     # expected digest, if the client sent one
+    attendence = models.PositiveIntegerField()
+    inference_mode = models.CharField(max_length=10, choices=School.MODE_CHOICES, blank=True, default="")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_OPEN)
+    upload = models.OneToOneField(ImageUpload, null=True, blank=True, on_delete=models.SET_NULL, related_name="upload_session")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "updated_at"], name="uploadsession_stale_idx"),
+        ]
+
+    @property
+    def partial_path(self):
+        return f"uploads/partial/{self.pk}.part"
+
+    def __str__(self):
+        return f"UploadSession {self.pk} ({self.filename}, {self.received} bytes)"
+
+
 # ---------------------------------- Notification -------------------------------------------------
 
 class Notification(models.Model):
@@ -105,4 +192,40 @@ class DailyReport(models.Model):
         ordering = ["-report_date"]
     
     def __str__(self):
-        return f"DailyReport {self.report_date} (uploads={self.total_uploads})"
\ No newline at end of file
+        return f"DailyReport {self.report_date} (uploads={self.total_uploads})"
+
+
+# ---------------------------------- DailyUploadStats -------------------------------------------------
+
+class DailyUploadStats(models.Model):
+    """Running per-day counters, bumped with F() updates as uploads are processed (see app.stats).
+
+    One row per (date, school), plus a school=NULL row holding the totals over all schools.
+    """
+
+    date = models.DateField()
+    school = models.ForeignKey(School, null=True, blank=True, on_delete=models.CASCADE, related_name="daily_stats")
+    total_uploads = models.IntegerField(default=0)
+    total_duplicates = models.IntegerField(default=0)
+    total_attendance = models.IntegerField(default=0)
+    counted_uploads = models.IntegerField(default=0)       # uploads with a head_count
+    total_head_count = models.IntegerField(default=0)
+    total_discrepancy = models.IntegerField(default=0)     # sum of |attendence - head_count| over counted uploads
+
+    class Meta:
+        ordering = ["-date"]
+        constraints = [
+            models.UniqueConstraint(fields=["date", "school"], name="dailyuploadstats_date_school_uniq"),
+            models.UniqueConstraint(fields=["date"], condition=models.Q(school__isnull=True), name="dailyuploadstats_date_all_uniq"),
+        ]
+
+    @property
+    def average_head_count(self):
+        return self.total_head_count / self.counted_uploads if self.counted_uploads else None
+
+    @property
+    def average_discrepancy(self):
+        return self.total_discrepancy / self.counted_uploads if self.counted_uploads else None
+
+    def __str__(self):
+        return f"DailyUploadStats {self.date} ({self.school or 'all schools'})"
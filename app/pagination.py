@@ -0,0 +1,69 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+
+class KeysetPagination:
+    """Cursor pagination over (timestamp, id), newest first.
+
+    Each page is `WHERE (ts, id) < (last_ts, last_id) ORDER BY ts DESC, id DESC
+    LIMIT n`, which walks the (ts, id) index no matter how deep the page is,
+    unlike OFFSET. The cursor is an opaque base64 of the last row's key.
+    """
+
+    default_page_size = 50
+    max_page_size = 200
+
+    def __init__(self, timestamp_field="upload_timestamp"):
+        self.timestamp_field = timestamp_field
+
+    # ----------------------------------------------------------
+    def encode_cursor(self, obj):
+        raw = f"{getattr(obj, self.timestamp_field).isoformat()}|{obj.pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            timestamp, pk = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+            return datetime.fromisoformat(timestamp), int(pk)
+        except (ValueError, UnicodeDecodeError):
+            raise ValidationError({"cursor": "Invalid cursor"})
+
+    def page_size(self, params):
+        try:
+            size = int(params.get("page_size", self.default_page_size))
+        except ValueError:
+            raise ValidationError({"page_size": "Must be an integer"})
+        return max(1, min(size, self.max_page_size))
+
+    # ----------------------------------------------------------
+    def page_queryset(self, queryset, params):
+        """(queryset limited to the requested page plus one row, page size)."""
+        ts = self.timestamp_field
+        queryset = queryset.order_by(f"-{ts}", "-pk")
+
+        cursor = params.get("cursor")
+        if cursor:
+            last_ts, last_pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(Q(**{f"{ts}__lt": last_ts}) | Q(**{ts: last_ts, "pk__lt": last_pk}))
+
+        size = self.page_size(params)
+        return queryset[:size + 1], size   # one extra row tells us whether there is a next page
+
+    def split_page(self, rows, size):
+        if len(rows) > size:
+            rows = rows[:size]
+            return rows, self.encode_cursor(rows[-1])
+        return rows, None
+
+    def paginate(self, queryset, request):
+        """Return (rows, next_cursor); next_cursor is None on the last page."""
+        page, size = self.page_queryset(queryset, request.query_params)
+        return self.split_page(list(page), size)
+
+    async def apaginate(self, queryset, params):
+        """paginate() for async views, `params` being request.GET."""
+        page, size = self.page_queryset(queryset, params)
+        return self.split_page([row async for row in page], size)
@@ -0,0 +1,24 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:   # optional, falls back to DRF's json renderer
+    orjson = None
+
+_default = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes with orjson when it is installed.
+
+    Same compact, UTF-8 output; anything orjson can't encode natively
+    (Decimal, lazy strings, ...) goes through DRF's encoder.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)   # ?indent / pretty printing
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,167 @@
+"""Read-only fast path for list responses.
+
+Builds the same dicts as the serializers in app.serializers, field for field
+and in the same order, straight from one `.values()` query with the related
+rows joined in, instead of running DRF's field machinery (and nested
+serializers) per row. Write paths and single-object responses keep using the
+serializers; `manage.py bench_serializers` checks both give identical output.
+"""
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import DailyReport, Notification, School, User
+
+SCHOOL_FIELDS = ["id", "name", "address", "inference_mode", "tile_size", "tile_overlap"]
+USER_FIELDS = ["id", "first_name", "last_name", "email", "role"]
+UPLOAD_FIELDS = [
+    "id", "image_file", "upload_timestamp", "original_filename", "upload_date", "duplicate_flag", "image_hash",
+    "attendence", "head_count", "inference_status", "inference_error", "inference_mode", "school",
+]
+
+
+def _prefixed(prefix, fields):
+    return [prefix + field for field in fields]
+
+
+def _datetime(value):
+    # same as rest_framework.fields.DateTimeField.to_representation
+    if value is None:
+        return None
+    if settings.USE_TZ and timezone.is_aware(value):
+        value = timezone.localtime(value)
+    value = value.isoformat()
+    return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+
+def _date(value):
+    return value.isoformat() if value is not None else None
+
+
+def _file_url(name):
+    return default_storage.url(name) if name else None
+
+
+# ----------------------------------------------------------
+def school_columns(prefix=""):
+    return _prefixed(prefix, SCHOOL_FIELDS)
+
+
+def school_row(v, prefix=""):
+    return {field: v[prefix + field] for field in SCHOOL_FIELDS}
+
+
+def user_columns(prefix=""):
+    return _prefixed(prefix, USER_FIELDS) + school_columns(prefix + "school__")
+
+
+def user_row(v, prefix=""):
+    first_name, last_name = v[prefix + "first_name"], v[prefix + "last_name"]
+    return {
+        "id": v[prefix + "id"],
+        "first_name": first_name,
+        "last_name": last_name,
+        "full_name": f"{first_name} {last_name}",
+        "email": v[prefix + "email"],
+        "role": v[prefix + "role"],
+        "school": school_row(v, prefix + "school__"),
+    }
+
+
+def upload_columns(prefix=""):
+    return _prefixed(prefix, UPLOAD_FIELDS) + user_columns(prefix + "user__")
+
+
+def upload_row(v, prefix=""):
+    # ImageUploadSerializer
+    if v[prefix + "id"] is None:   # nullable FK pointing nowhere
+        return None
+    return {
+        "id": v[prefix + "id"],
+        "user": user_row(v, prefix + "user__"),
+        "image_file": _file_url(v[prefix + "image_file"]),
+        "upload_timestamp": _datetime(v[prefix + "upload_timestamp"]),
+        "original_filename": v[prefix + "original_filename"],
+        "upload_date": _date(v[prefix + "upload_date"]),
+        "duplicate_flag": v[prefix + "duplicate_flag"],
+        "image_hash": v[prefix + "image_hash"],
+        "attendence": v[prefix + "attendence"],
+        "head_count": v[prefix + "head_count"],
+        "inference_status": v[prefix + "inference_status"],
+        "inference_error": v[prefix + "inference_error"],
+        "inference_mode": v[prefix + "inference_mode"],
+        "school": v[prefix + "school"],
+    }
+
+
+# ----------------------------------------------------------
+def schools(queryset=None):
+    queryset = School.objects.all() if queryset is None else queryset
+    return [school_row(v) for v in queryset.values(*school_columns())]
+
+
+def users(queryset=None):
+    queryset = User.objects.all() if queryset is None else queryset
+    return [user_row(v) for v in queryset.values(*user_columns())]
+
+
+def uploads(queryset):
+    return [upload_row(v) for v in queryset.values(*upload_columns())]
+
+
+def notifications(queryset=None):
+    # NotificationSerializer: user, and the image with its own user, all from one query
+    queryset = Notification.objects.all() if queryset is None else queryset
+    columns = ["id", "type", "message", "sent_at"] + user_columns("user__") + upload_columns("image__")
+    return [
+        {
+            "id": v["id"],
+            "user": user_row(v, "user__"),
+            "image": upload_row(v, "image__"),
+            "type": v["type"],
+            "message": v["message"],
+            "sent_at": _datetime(v["sent_at"]),
+        }
+        for v in queryset.values(*columns)
+    ]
+
+
+def reports(queryset=None):
+    queryset = DailyReport.objects.all() if queryset is None else queryset
+    columns = ["id", "report_date", "total_uploads", "total_duplicates", "report_path", "generated_at"]
+    return [
+        {
+            "id": v["id"],
+            "report_date": _date(v["report_date"]),
+            "total_uploads": v["total_uploads"],
+            "total_duplicates": v["total_duplicates"],
+            "report_path": _file_url(v["report_path"]),
+            "generated_at": _datetime(v["generated_at"]),
+        }
+        for v in queryset.values(*columns)
+    ]
+
+
+def upload_list(rows):
+    """ImageUploadListSerializer rows for already fetched (select_related) uploads, e.g. a keyset page."""
+    thumbnail = reverse("image-thumbnail", args=[0, "small"]).replace("/0/", "/{}/", 1)
+    return [
+        {
+            "id": upload.pk,
+            "user_id": upload.user_id,
+            "user_name": f"{upload.user.first_name} {upload.user.last_name}",
+            "school_id": upload.user.school_id,
+            "school_name": upload.user.school.name,
+            "image_file": _file_url(upload.image_file.name),
+            "thumbnail": thumbnail.format(upload.pk),
+            "upload_timestamp": _datetime(upload.upload_timestamp),
+            "original_filename": upload.original_filename,
+            "attendence": upload.attendence,
+            "head_count": upload.head_count,
+            "duplicate_flag": upload.duplicate_flag,
+            "inference_status": upload.inference_status,
+        }
+        for upload in rows
+    ]
+
@@ -1,6 +1,11 @@
+import os
+
 from django.contrib.auth import get_user_model
+from django.core.exceptions import SuspiciousFileOperation
+from django.urls import reverse
+from django.utils.text import get_valid_filename
 from rest_framework import serializers
-from .models import School, ImageUpload, Notification, DailyReport
+from .models import School, ImageUpload, Notification, DailyReport, UploadSession
 from django.utils.crypto import get_random_string
 
 User = get_user_model() # As we have cutom user 
@@ -75,7 +80,8 @@ class ImageUploadSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = ImageUpload
-        fields = "__all__"
+        exclude = ["detections"]   # packed boxes, served drawn via images/<pk>/labeled/
+        read_only_fields = ["inference_status", "inference_error", "school", "upload_date"]
 
     
     def create(self, validated_data):
@@ -93,6 +99,69 @@ class ImageUploadSerializer(serializers.ModelSerializer):
 
 # ----------------------------------------------------------------------------
 
+class ImageUploadListSerializer(serializers.ModelSerializer):
+    # flat, read-only row for listings; expects .select_related("user__school")
+    user_name = serializers.SerializerMethodField()
+    school_id = serializers.IntegerField(source="user.school_id", read_only=True)
+    school_name = serializers.CharField(source="user.school.name", read_only=True)
+    thumbnail = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImageUpload
+        fields = [
+            "id", "user_id", "user_name", "school_id", "school_name", "image_file", "thumbnail", "upload_timestamp",
+            "original_filename", "attendence", "head_count", "duplicate_flag", "inference_status",
+        ]
+        read_only_fields = fields
+
+    def get_user_name(self, obj):
+        return f"{obj.user.first_name} {obj.user.last_name}"
+
+    def get_thumbnail(self, obj):
+        url = reverse("image-thumbnail", args=[obj.pk, "small"])
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+# ----------------------------------------------------------------------------
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    user_id = serializers.PrimaryKeyRelatedField(
+        queryset=User.objects.all(), source="user", write_only=True, required=False
+    )
+    offset = serializers.IntegerField(source="received", read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            "id", "user_id", "filename", "total_size", "offset", "sha256", "attendence",
+            "inference_mode", "status", "upload", "created_at", "updated_at",
+        ]
+        read_only_fields = ["status", "upload"]
+
+    def validate_filename(self, value):
+        # stored under this name at commit: no directories, nothing storage would refuse
+        try:
+            return get_valid_filename(os.path.basename(value.replace("\\", "/")))
+        except SuspiciousFileOperation:
+            raise serializers.ValidationError("Not a valid file name")
+
+    def validate_total_size(self, value):
+        from .chunked import max_size
+        if value is not None and value > max_size():
+            raise serializers.ValidationError(f"At most {max_size()} bytes")
+        return value
+
+    def create(self, validated_data):
+        request = self.context.get("request", None)
+        user = validated_data.pop("user", None)
+        if user is None and request and request.user and request.user.is_authenticated:
+            user = request.user
+        if user is None:
+            raise serializers.ValidationError({"user_id": "This field is required."})
+        return UploadSession.objects.create(user=user, **validated_data)
+
+# ----------------------------------------------------------------------------
+
 class NotificationSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     user_id = serializers.PrimaryKeyRelatedField(
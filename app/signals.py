@@ -0,0 +1,42 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import caching, stats
+from .authentication import principals
+from .models import DailyReport, ImageUpload, School, User
+
+
+@receiver(post_delete, sender=ImageUpload)
+def remove_from_daily_stats(sender, instance, **kwargs):
+    # post_delete also fires for cascades (user / school deletes), unlike the delete view
+    stats.record_delete(instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user_principal(sender, instance, **kwargs):
+    principals.forget(user_id=instance.pk)
+
+
+@receiver(post_save, sender=School)
+def forget_school_principals(sender, instance, **kwargs):
+    principals.forget(school_id=instance.pk)
+
+
+# cached list responses (app.caching) that show each model
+@receiver(post_save, sender=School)
+@receiver(post_delete, sender=School)
+def invalidate_school_lists(sender, **kwargs):
+    caching.invalidate_on_commit("schools", "users")
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_lists(sender, **kwargs):
+    caching.invalidate_on_commit("users")
+
+
+@receiver(post_save, sender=DailyReport)
+@receiver(post_delete, sender=DailyReport)
+def invalidate_report_lists(sender, **kwargs):
+    caching.invalidate_on_commit("reports")
@@ -0,0 +1,139 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Abs, Coalesce
+
+from . import caching
+from .models import DailyReport, DailyUploadStats, ImageUpload
+
+# Every change is an UPDATE ... SET col = col + delta on the (date, school) row and the
+# (date, all schools) row, so concurrent workers never read-modify-write the counters.
+
+
+def _bump(date, school_id, create=True, **deltas):
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas or date is None:
+        return
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+
+    for sid in {school_id, None}:
+        if DailyUploadStats.objects.filter(date=date, school_id=sid).update(**updates) or not create:
+            continue
+        try:
+            with transaction.atomic():
+                DailyUploadStats.objects.create(date=date, school_id=sid, **deltas)
+        except IntegrityError:   # another worker created the row first
+            DailyUploadStats.objects.filter(date=date, school_id=sid).update(**updates)
+
+    report_updates = {}
+    if "total_uploads" in deltas:
+        report_updates["total_uploads"] = F("total_uploads") + deltas["total_uploads"]
+    if "total_duplicates" in deltas:
+        report_updates["total_duplicates"] = F("total_duplicates") + deltas["total_duplicates"]
+    if report_updates and DailyReport.objects.filter(report_date=date).update(**report_updates):
+        caching.invalidate_on_commit("reports")   # .update() sends no post_save
+
+
+def _discrepancy(upload, head_count):
+    return abs(upload.attendence - head_count)
+
+
+# ----------------------------------------------------------
+def record_upload(upload):
+    _bump(upload.upload_date, upload.school_id, total_uploads=1, total_attendance=upload.attendence)
+
+
+def record_duplicate(upload):
+    _bump(upload.upload_date, upload.school_id, total_duplicates=1)
+
+
+def record_head_count(upload, head_count, previous=None):
+    """Count a new head_count for `upload`; pass `previous` when replacing an earlier one."""
+    if previous is None:
+        _bump(
+            upload.upload_date, upload.school_id,
+            counted_uploads=1,
+            total_head_count=head_count,
+            total_discrepancy=_discrepancy(upload, head_count),
+        )
+    else:
+        _bump(
+            upload.upload_date, upload.school_id,
+            total_head_count=head_count - previous,
+            total_discrepancy=_discrepancy(upload, head_count) - _discrepancy(upload, previous),
+        )
+
+
+def record_delete(upload):
+    deltas = {"total_uploads": -1, "total_attendance": -upload.attendence}
+    if upload.duplicate_flag:
+        deltas["total_duplicates"] = -1
+    if upload.head_count is not None:
+        deltas.update(
+            counted_uploads=-1,
+            total_head_count=-upload.head_count,
+            total_discrepancy=-_discrepancy(upload, upload.head_count),
+        )
+    _bump(upload.upload_date, upload.school_id, create=False, **deltas)
+
+
+# ----------------------------------------------------------
+def record_uploads(uploads):
+    """record_upload / record_duplicate for a batch: one F() update per (date, school) instead of per row."""
+    totals = {}
+    for upload in uploads:
+        deltas = totals.setdefault((upload.upload_date, upload.school_id), {"total_uploads": 0, "total_attendance": 0, "total_duplicates": 0})
+        deltas["total_uploads"] += 1
+        deltas["total_attendance"] += upload.attendence
+        deltas["total_duplicates"] += bool(upload.duplicate_flag)
+    for (date, school_id), deltas in totals.items():
+        _bump(date, school_id, **deltas)
+
+
+def record_head_counts(counted):
+    """record_head_count for a batch of (upload, head_count) pairs on uploads that had no count yet."""
+    totals = {}
+    for upload, head_count in counted:
+        deltas = totals.setdefault((upload.upload_date, upload.school_id), {"counted_uploads": 0, "total_head_count": 0, "total_discrepancy": 0})
+        deltas["counted_uploads"] += 1
+        deltas["total_head_count"] += head_count
+        deltas["total_discrepancy"] += _discrepancy(upload, head_count)
+    for (date, school_id), deltas in totals.items():
+        _bump(date, school_id, **deltas)
+
+
+# ----------------------------------------------------------
+def get_summary(date, school_id=None):
+    return DailyUploadStats.objects.filter(date=date, school_id=school_id).first()
+
+
+def rebuild(date_from=None, date_to=None):
+    """Recompute the counters from ImageUpload (repair / backfill). Returns the number of rows written."""
+    uploads = ImageUpload.objects.exclude(upload_date__isnull=True)
+    stats = DailyUploadStats.objects.all()
+    if date_from:
+        uploads, stats = uploads.filter(upload_date__gte=date_from), stats.filter(date__gte=date_from)
+    if date_to:
+        uploads, stats = uploads.filter(upload_date__lte=date_to), stats.filter(date__lte=date_to)
+
+    counted = Q(head_count__isnull=False)
+    aggregates = dict(
+        total_uploads=Count("id"),
+        total_duplicates=Count("id", filter=Q(duplicate_flag=True)),
+        total_attendance=Coalesce(Sum("attendence"), 0),
+        counted_uploads=Count("id", filter=counted),
+        total_head_count=Coalesce(Sum("head_count", filter=counted), 0),
+        total_discrepancy=Coalesce(Sum(Abs(F("attendence") - F("head_count")), filter=counted), 0),
+    )
+    rows = [
+        DailyUploadStats(date=row.pop("upload_date"), school_id=row.pop("school_id"), **row)
+        for row in uploads.exclude(school__isnull=True).values("upload_date", "school_id").annotate(**aggregates).order_by()
+    ]
+    rows += [
+        DailyUploadStats(date=row.pop("upload_date"), school_id=None, **row)
+        for row in uploads.values("upload_date").annotate(**aggregates).order_by()
+    ]
+
+    with transaction.atomic():
+        stats.delete()
+        DailyUploadStats.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
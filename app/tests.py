@@ -1,3 +1,73 @@
-from django.test import TestCase
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import date
 
-# Create your tests here.
+from django.conf import settings
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from .filters import filter_uploads
+from .models import ImageUpload, School, User
+
+
+class ImageUploadIndexTests(TestCase):
+    """The listing filters are served by the composite indexes from migration 0005."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(name="School")
+        cls.user = User.objects.create_user(username="uploader", email="u@example.com", password="x", school=cls.school)
+
+    def assertUsesIndex(self, queryset, index):
+        if connection.vendor != "sqlite":
+            self.skipTest("plan format checked for SQLite only")
+        plan = queryset.explain()   # EXPLAIN QUERY PLAN on SQLite
+        self.assertIn(index, plan, f"{index} not used:\n{plan}")
+
+    def test_recent_per_user(self):
+        uploads = ImageUpload.objects.filter(user_id=self.user.pk).order_by("-upload_timestamp")[:10]
+        self.assertUsesIndex(uploads, "imageupload_user_recent_idx")
+
+    def test_school_and_date(self):
+        uploads = filter_uploads(ImageUpload.objects.all(), {"school": str(self.school.pk), "date": "2025-01-15"})
+        self.assertUsesIndex(uploads, "imageupload_school_date_idx")
+
+    def test_school_and_date_range(self):
+        uploads = filter_uploads(
+            ImageUpload.objects.all(), {"school": str(self.school.pk), "date_from": "2025-01-01", "date_to": "2025-01-31"}
+        )
+        self.assertUsesIndex(uploads, "imageupload_school_date_idx")
+
+    def test_date_range(self):
+        uploads = ImageUpload.objects.filter(upload_date__gte=date(2025, 1, 1), upload_date__lte=date(2025, 1, 31))
+        self.assertUsesIndex(uploads, "imageupload_date_idx")
+
+
+
+@unittest.skipIf(settings.DATABASE_URL, "SQLite tuning")
+class StressDBWritesTests(SimpleTestCase):
+    """stress_db_writes on a real SQLite file (the test database is in memory), in a subprocess."""
+
+    def test_concurrent_writers(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # the shipped SQLite settings, whatever this run overrides
+            env = {name: value for name, value in os.environ.items() if not name.startswith("SQLITE_")}
+            env["SQLITE_PATH"] = os.path.join(tmpdir, "db.sqlite3")
+
+            def manage(*args):
+                return subprocess.run(
+                    [sys.executable, "manage.py", *args], cwd=settings.BASE_DIR, env=env,
+                    capture_output=True, text=True, check=True, timeout=300,
+                ).stdout
+
+            manage("migrate", "--verbosity", "0")
+            output = manage("stress_db_writes", "--workers", "6", "--uploads", "30", "--readers", "2")
+
+        self.assertIn("journal_mode=wal", output)
+        self.assertRegex(output, r"busy_timeout=[1-9]\d*")
+        self.assertRegex(output, r"writes: 180 in .*, 0 errors")
+        self.assertRegex(output, r"reads: \d+ in .*, 0 errors")
+        self.assertNotIn("database is locked", output)
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 appurls = [
     # Schools
@@ -14,8 +14,17 @@ appurls = [
 
     # Images
     path("images/", views.ImageUploadListCreateAPIView.as_view(), name="image-list-create"),
+    path("images/async/", async_views.image_list_create, name="image-list-create-async"),   # same as images/, for ASGI
+    path("images/bulk/", views.ImageUploadBulkCreateAPIView.as_view(), name="image-bulk-create"),
+    path("images/uploads/", views.UploadSessionCreateAPIView.as_view(), name="upload-session-create"),
+    path("images/uploads/<uuid:pk>/", views.UploadSessionDetailAPIView.as_view(), name="upload-session-detail"),
+    path("images/uploads/<uuid:pk>/commit/", views.UploadSessionCommitAPIView.as_view(), name="upload-session-commit"),
     path("images/recent/", views.ImageUploadRecentAPIView.as_view(), name="image-recent"),
+    path("images/cache/", views.InferenceCacheStatsAPIView.as_view(), name="image-cache-stats"),
     path("images/<int:pk>/", views.ImageUploadDetailAPIView.as_view(), name="image-detail"),
+    path("images/<int:pk>/status/", views.ImageUploadStatusAPIView.as_view(), name="image-status"),
+    path("images/<int:pk>/thumbnail/<str:size>/", views.ImageUploadThumbnailAPIView.as_view(), name="image-thumbnail"),
+    path("images/<int:pk>/labeled/", views.ImageUploadLabeledAPIView.as_view(), name="image-labeled"),
 
     # Notifications
     path("notifications/", views.NotificationListCreateAPIView.as_view(), name="notif-list-create"),
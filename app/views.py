@@ -1,12 +1,20 @@
+from django.conf import settings
+from django.http import FileResponse, HttpResponseNotModified
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.contrib.auth import get_user_model, authenticate
-from rest_framework import status, permissions
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers, status, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
-from .models import School, ImageUpload, Notification, DailyReport
-from model.main import MyModel
+from rest_framework.exceptions import ValidationError
+from .models import School, ImageUpload, Notification, DailyReport, DailyUploadStats, UploadSession
+from model import ingest
+from . import bulk, caching, chunked, dedupe, derivatives, inference, rows as fast_rows, stats
+from .authentication import LoginRateThrottle, issue_token, token_max_age
+from .filters import filter_uploads
+from .pagination import KeysetPagination
 from .serializers import *
 
 User = get_user_model()
@@ -16,6 +24,7 @@ User = get_user_model()
 
 class LoginAPIView(APIView):
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [LoginRateThrottle]
     
     def post(self, request):
         email = request.data.get("email")
@@ -28,12 +37,15 @@ class LoginAPIView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            user = User.objects.get(email=email)
+            user = User.objects.select_related("school").get(email=email)
             if user.check_password(password):
+                # send the token as `Authorization: Bearer <token>` instead of logging in again
                 return Response({
                     "success": True,
                     "message": "Login successful",
-                    "data": UserSerializer(user).data
+                    "data": UserSerializer(user).data,
+                    "token": issue_token(user),
+                    "expires_in": token_max_age()
                 })
             else:
                 return Response({
@@ -70,12 +82,11 @@ class SchoolListCreateAPIView(APIView):
     permission_classes = [permissions.AllowAny]
     
     def get(self, request):
-        schools = School.objects.all()
-        serializer = SchoolSerializer(schools, many=True)
-        return Response({
+        # served from app.caching until a School changes
+        return caching.cached_response(request, "schools", lambda: {
             "success": True,
             "message": "Schools fetched successfully",
-            "data": serializer.data
+            "data": fast_rows.schools()
         })
     
     def post(self, request):
@@ -134,12 +145,11 @@ class UserListAPIView(APIView):
     permission_classes = [permissions.AllowAny]
     
     def get(self, request):
-        users = User.objects.all()
-        serializer = UserSerializer(users, many=True)
-        return Response({
+        # served from app.caching until a User (or School, nested in each row) changes
+        return caching.cached_response(request, "users", lambda: {
             "success": True,
             "message": "Users fetched successfully",
-            "data": serializer.data
+            "data": fast_rows.users()
         })
 
 class UserDetailAPIView(APIView):
@@ -160,29 +170,54 @@ class ImageUploadListCreateAPIView(APIView):
     parser_classes = [MultiPartParser, FormParser]
     
     def get(self, request):
-        uploads = ImageUpload.objects.all().order_by("-upload_timestamp")
-        serializer = ImageUploadSerializer(uploads, many=True)
+        # filters (see app.filters) + keyset pages (?cursor=&page_size=) over (upload_timestamp, id),
+        # user + school joined in
+        uploads = ImageUpload.objects.select_related("user__school").defer("detections")
+        try:
+            uploads = filter_uploads(uploads, request.query_params)
+            rows, next_cursor = KeysetPagination().paginate(uploads, request)
+        except ValidationError as exc:
+            return Response({
+                "success": False,
+                "message": "Invalid query parameters",
+                "errors": exc.detail
+            }, status=status.HTTP_400_BAD_REQUEST)
+
         return Response({
             "success": True,
             "message": "Images fetched successfully",
-            "data": serializer.data
+            "data": fast_rows.upload_list(rows),   # ImageUploadListSerializer shape
+            "next_cursor": next_cursor
         })
     
     def post(self, request):
         serializer = ImageUploadSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            upload = serializer.save()
+            # Decode (at model resolution) and hash straight from the upload buffer, so nothing
+            # has to read the full-size file back from storage after it is written
+            image_file = serializer.validated_data["image_file"]
+            uploader = serializer.validated_data.get("user") or request.user
+            # sliced inference (per upload, or the school's default) needs a bigger decode
+            tiling = inference.resolve_tiling(getattr(uploader, "school", None), serializer.validated_data.get("inference_mode"))
+            image = ingest.load_image(image_file, max_size=ingest.TILED_INPUT_SIZE if tiling else None)
+            digest = ingest.content_digest(image_file)
 
+            # the perceptual hash goes in with the row, so every worker's duplicate index sees it
+            upload = serializer.save(image_hash=dedupe.hash_to_hex(dedupe.dhash(image)))
+            stats.record_upload(upload)
 
-            model = MyModel.get_model()   # it's a (static meathod) => no need to create object 
-            image_path = upload.image_file.path  
+            # Near-duplicate lookup (sets duplicate_flag / raises an alert)
+            original = dedupe.check_duplicate(upload, image=image)
 
-            # Run head count Model
-            head_count = model.predict_and_count(image_path)
-            print(head_count)
-            upload.head_count = head_count
-            upload.save()
+            # Run head count Model (result cache first, then queued to the worker pool unless INFERENCE_ASYNC is off)
+            inference.submit(upload, original=original, image=image, digest=digest)
 
+            if upload.inference_status == ImageUpload.STATUS_PENDING:
+                return Response({
+                    "success": True,
+                    "message": "Image uploaded successfully, head count is being processed",
+                    "data": ImageUploadSerializer(upload).data
+                }, status=status.HTTP_202_ACCEPTED)
             return Response({
                 "success": True,
                 "message": "Image uploaded successfully",
@@ -194,6 +229,63 @@ class ImageUploadListCreateAPIView(APIView):
             "errors": serializer.errors
         }, status=status.HTTP_400_BAD_REQUEST)
 
+class ImageUploadBulkCreateAPIView(APIView):
+    permission_classes = [permissions.AllowAny]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        # many image_files (and/or one zip `archive`) in one request; attendence for all of them,
+        # or attendences=<n> repeated once per file in the same order
+        user_id = request.data.get("user_id")
+        errors = {}
+        if user_id:
+            # same lookup / messages as ImageUploadSerializer's user_id
+            try:
+                user = serializers.PrimaryKeyRelatedField(queryset=User.objects.select_related("school")).to_internal_value(user_id)
+            except ValidationError as exc:
+                user = None
+                errors["user_id"] = str(exc.detail[0])
+        else:
+            user = request.user
+            if not getattr(user, "is_authenticated", False):
+                errors["user_id"] = "A valid user_id is required"
+
+        inference_mode = request.data.get("inference_mode", "")
+        if inference_mode and inference_mode not in dict(School.MODE_CHOICES):
+            errors["inference_mode"] = f"Must be one of {', '.join(dict(School.MODE_CHOICES))}"
+
+        try:
+            files = bulk.collect_files(request.FILES.getlist("image_files"), request.FILES.get("archive"))
+        except bulk.BulkUploadError as exc:
+            errors["image_files"] = str(exc)
+            files = []
+
+        attendences = request.data.getlist("attendences") or [request.data.get("attendence")] * len(files)
+        try:
+            attendences = [int(value) for value in attendences]
+            if any(value < 0 for value in attendences):
+                raise ValueError
+        except (TypeError, ValueError):
+            errors["attendence"] = "attendence (or one attendences value per file) must be a non-negative integer"
+        else:
+            if files and len(attendences) != len(files):
+                errors["attendences"] = f"Got {len(attendences)} attendences for {len(files)} images"
+
+        if errors:
+            return Response({
+                "success": False,
+                "message": "Upload failed",
+                "errors": errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        results = bulk.create_uploads(user, files, attendences, inference_mode)
+        stored = sum(result["success"] for result in results)
+        return Response({
+            "success": stored > 0,
+            "message": f"{stored} of {len(results)} images uploaded",
+            "data": results
+        }, status=status.HTTP_201_CREATED if stored else status.HTTP_400_BAD_REQUEST)
+
 class ImageUploadDetailAPIView(APIView):
     permission_classes = [permissions.AllowAny]
     
@@ -213,6 +305,186 @@ class ImageUploadDetailAPIView(APIView):
             "message": "Image deleted successfully"
         }, status=status.HTTP_204_NO_CONTENT)
 
+class ImageUploadStatusAPIView(APIView):
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request, pk):
+        upload = get_object_or_404(ImageUpload, pk=pk)
+        return Response({
+            "success": True,
+            "message": "Image status fetched successfully",
+            "data": {
+                "id": upload.pk,
+                "status": upload.inference_status,
+                "head_count": upload.head_count,
+                "error": upload.inference_error or None,
+            }
+        })
+
+# -------------------------------------------- Resumable uploads ------------------------------------------------------------
+# POST images/uploads/ opens a session, PATCH images/uploads/<id>/ sends raw bytes with an
+# Upload-Offset header, GET tells where to resume, POST images/uploads/<id>/commit/ finishes.
+
+class UploadSessionCreateAPIView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        serializer = UploadSessionSerializer(data=request.data, context={'request': request})
+        if serializer.is_valid():
+            session = serializer.save()
+            return Response({
+                "success": True,
+                "message": "Upload session created",
+                "data": UploadSessionSerializer(session).data
+            }, status=status.HTTP_201_CREATED)
+        return Response({
+            "success": False,
+            "message": "Validation failed",
+            "errors": serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+class UploadSessionDetailAPIView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, pk):
+        session = get_object_or_404(UploadSession, pk=pk)
+        return Response({
+            "success": True,
+            "message": "Upload session fetched successfully",
+            "data": UploadSessionSerializer(session).data
+        })
+
+    def patch(self, request, pk):
+        # the body is the raw chunk; request.data is never touched, so nothing parses or buffers it
+        try:
+            offset = int(request.headers["Upload-Offset"])
+            length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except (KeyError, ValueError):
+            return Response({
+                "success": False,
+                "message": "Upload-Offset and Content-Length headers are required"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        max_chunk = getattr(settings, "CHUNKED_UPLOAD_MAX_CHUNK_SIZE", 8 * 1024 * 1024)
+        if not 0 < length <= max_chunk:
+            return Response({
+                "success": False,
+                "message": f"Chunks must be between 1 and {max_chunk} bytes"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # no transaction around this: the chunk may take a while to arrive (see chunked.append_chunk)
+        session = get_object_or_404(UploadSession, pk=pk)
+        try:
+            received = chunked.append_chunk(session, offset, request.stream, length)
+        except chunked.ChunkOffsetError as exc:
+            return Response({
+                "success": False,
+                "message": str(exc),
+                "data": {"offset": exc.expected}
+            }, status=status.HTTP_409_CONFLICT)
+        except chunked.ChunkConflictError as exc:
+            return Response({
+                "success": False,
+                "message": str(exc)
+            }, status=status.HTTP_409_CONFLICT)
+        except chunked.ChunkError as exc:
+            return Response({
+                "success": False,
+                "message": str(exc)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "success": True,
+            "message": "Chunk received",
+            "data": {"offset": received, "total_size": session.total_size}
+        }, headers={"Upload-Offset": str(received)})
+
+    def delete(self, request, pk):
+        session = get_object_or_404(UploadSession, pk=pk)
+        chunked.abort(session)
+        return Response({
+            "success": True,
+            "message": "Upload session deleted"
+        }, status=status.HTTP_204_NO_CONTENT)
+
+class UploadSessionCommitAPIView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request, pk):
+        session = get_object_or_404(UploadSession.objects.select_related("user__school"), pk=pk)
+        try:
+            upload = chunked.commit(session)
+        except chunked.ChunkConflictError as exc:
+            return Response({
+                "success": False,
+                "message": str(exc)
+            }, status=status.HTTP_409_CONFLICT)
+        except chunked.ChunkError as exc:
+            return Response({
+                "success": False,
+                "message": str(exc),
+                "data": {"offset": session.received}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if upload.inference_status == ImageUpload.STATUS_PENDING:
+            return Response({
+                "success": True,
+                "message": "Image uploaded successfully, head count is being processed",
+                "data": ImageUploadSerializer(upload).data
+            }, status=status.HTTP_202_ACCEPTED)
+        return Response({
+            "success": True,
+            "message": "Image uploaded successfully",
+            "data": ImageUploadSerializer(upload).data
+        }, status=status.HTTP_201_CREATED)
+
+def derivative_response(request, upload, kind):
+    # derivatives are immutable per ETag (it covers the file and the detections), so revalidation is cheap
+    tag = f'"{derivatives.etag(upload, kind)}"'
+    headers = {"ETag": tag, "Cache-Control": "private, max-age=86400"}
+    if tag in [t.strip() for t in request.headers.get("If-None-Match", "").split(",")]:
+        return HttpResponseNotModified(headers=headers)
+    return FileResponse(derivatives.open_derivative(upload, kind), content_type="image/jpeg", headers=headers)
+
+class ImageUploadThumbnailAPIView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, pk, size):
+        if size not in derivatives.THUMBNAIL_SIZES:
+            return Response({
+                "success": False,
+                "message": f"Unknown size, expected one of {', '.join(derivatives.THUMBNAIL_SIZES)}"
+            }, status=status.HTTP_404_NOT_FOUND)
+        upload = get_object_or_404(ImageUpload.objects.only("id", "image_file"), pk=pk)
+        return derivative_response(request, upload, size)
+
+class ImageUploadLabeledAPIView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, pk):
+        upload = get_object_or_404(ImageUpload.objects.only("id", "image_file", "detections", "inference_status"), pk=pk)
+        if upload.detections is None:
+            if upload.inference_status in (ImageUpload.STATUS_PENDING, ImageUpload.STATUS_RUNNING):
+                return Response({
+                    "success": False,
+                    "message": "Head count is still being processed"
+                }, status=status.HTTP_409_CONFLICT)
+            return Response({
+                "success": False,
+                "message": "No detections stored for this image"
+            }, status=status.HTTP_404_NOT_FOUND)
+        return derivative_response(request, upload, "labeled")
+
+class InferenceCacheStatsAPIView(APIView):
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request):
+        return Response({
+            "success": True,
+            "message": "Inference cache stats fetched successfully",
+            "data": {**inference.get_result_cache().stats(), "derivatives": derivatives.get_cache().stats()}
+        })
+
 class ImageUploadRecentAPIView(APIView):
     permission_classes = [permissions.AllowAny]
     
@@ -226,11 +498,10 @@ class ImageUploadRecentAPIView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         uploads = ImageUpload.objects.filter(user_id=user_id).order_by("-upload_timestamp")[:10]
-        serializer = ImageUploadSerializer(uploads, many=True)
         return Response({
             "success": True,
             "message": "Recent images fetched successfully",
-            "data": serializer.data
+            "data": fast_rows.uploads(uploads)   # ImageUploadSerializer shape, one query
         })
     
 # -------------------------------------------- Notification ------------------------------------------------------------
@@ -243,11 +514,10 @@ class NotificationListCreateAPIView(APIView):
             notifs = Notification.objects.filter(user=user)
         else:
             notifs = Notification.objects.all()
-        serializer = NotificationSerializer(notifs, many=True)
         return Response({
             "success": True,
             "message": "Notifications fetched successfully",
-            "data": serializer.data
+            "data": fast_rows.notifications(notifs)   # NotificationSerializer shape, one query
         })
     
     def post(self, request):
@@ -303,12 +573,11 @@ class DailyReportListCreateAPIView(APIView):
     permission_classes = [permissions.AllowAny]
     
     def get(self, request):
-        reports = DailyReport.objects.all().order_by("-report_date")
-        serializer = DailyReportSerializer(reports, many=True)
-        return Response({
+        # served from app.caching until a DailyReport changes
+        return caching.cached_response(request, "reports", lambda: {
             "success": True,
             "message": "Reports fetched successfully",
-            "data": serializer.data
+            "data": fast_rows.reports(DailyReport.objects.order_by("-report_date"))
         })
     
     def post(self, request):
@@ -349,15 +618,30 @@ class DailyReportSummaryAPIView(APIView):
     permission_classes = [permissions.AllowAny]
     
     def get(self, request):
-        today = timezone.localdate()
-        total_uploads = ImageUpload.objects.filter(upload_timestamp__date=today).count()
-        total_duplicates = ImageUpload.objects.filter(upload_timestamp__date=today, status="duplicate").count()
+        # one row lookup in the counters kept by app.stats, no scans over ImageUpload
+        day = request.query_params.get("date") or str(timezone.localdate())
+        school_id = request.query_params.get("school") or None
+        try:
+            summary = stats.get_summary(day, school_id)
+        except (ValueError, DjangoValidationError):
+            return Response({
+                "success": False,
+                "message": "Invalid date or school"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        summary = summary or DailyUploadStats(date=day, school_id=school_id)
         return Response({
             "success": True,
             "message": "Daily summary fetched successfully",
             "data": {
-                "date": str(today),
-                "total_uploads": total_uploads,
-                "total_duplicates": total_duplicates,
+                "date": str(day),
+                "school": summary.school_id,
+                "total_uploads": summary.total_uploads,
+                "total_duplicates": summary.total_duplicates,
+                "total_attendance": summary.total_attendance,
+                "counted_uploads": summary.counted_uploads,
+                "total_head_count": summary.total_head_count,
+                "average_head_count": summary.average_head_count,
+                "average_discrepancy": summary.average_discrepancy,
             }
         })
@@ -0,0 +1,40 @@
+# Gunicorn config: load the head count model once in the master before forking
+# so workers share its weights copy-on-write, then warm each worker up before
+# it accepts requests.
+#
+# The Procfile serves WSGI (sync workers, one request each). For the async upload /
+# list views (images/async/) run the ASGI app instead, e.g. with uvicorn's worker:
+#   gunicorn ImageProblem.asgi:application -k uvicorn.workers.UvicornWorker -c gunicorn.conf.py
+import gc
+import os
+
+# (skipped when HEADCOUNT_INFERENCE_SOCKET hands inference to `manage.py run_inference_server`)
+os.environ.setdefault("HEADCOUNT_PRELOAD", "1")
+
+preload_app = True
+
+
+def when_ready(server):
+    # the app (and model weights) are loaded; move everything to the permanent GC
+    # generation so collections in the workers don't touch, and un-share, those pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if os.environ.get("HEADCOUNT_INFERENCE_SOCKET"):
+        return   # the model lives in run_inference_server, nothing to warm up here
+
+    try:
+        import torch
+    except ImportError:
+        torch = None
+
+    if torch is not None:
+        # split the cores between workers instead of every worker grabbing all of them
+        workers = max(server.cfg.workers, 1)
+        default_threads = max((os.cpu_count() or 1) // workers, 1)
+        torch.set_num_threads(int(os.environ.get("HEADCOUNT_TORCH_THREADS", default_threads)))
+
+    from model.main import MyModel
+    MyModel.get_model().warmup()
+    server.log.info("Worker %s: head count model warmed up", worker.pid)
@@ -0,0 +1,105 @@
+"""Throughput benchmark for the head count model.
+
+    python -m model.bench --images images/2025/09/02 --batch-sizes 1 4 8 16
+    python -m model.bench --tiled --tile-size 640 --overlap 0.2
+
+Reports images/sec for a direct batched YOLO call at each batch size, and for
+the BatchingEngine fed by concurrent callers. With --tiled it reports
+tiles/sec and images/sec for sliced inference instead.
+"""
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from .ingest import TILED_INPUT_SIZE, load_image
+from .main import MyModel, BatchingEngine
+from .tiling import tile_grid
+
+
+def load_images(folder, limit, max_size=None):
+    paths = sorted(glob.glob(os.path.join(folder, "*.jpg")) + glob.glob(os.path.join(folder, "*.png")))
+    if not paths:
+        raise SystemExit(f"No images found in {folder}")
+    if max_size:
+        return [load_image(p, max_size=max_size) for p in paths[:limit]]
+    images = [Image.open(p).convert("RGB") for p in paths[:limit]]
+    return images
+
+
+def make_batch(images, size):
+    # repeat the reference images to fill the batch
+    return [images[i % len(images)] for i in range(size)]
+
+
+# ----------------------------------------------------------
+def bench_direct(model, images, batch_size, rounds):
+    batch = make_batch(images, batch_size)
+    model.yolo(batch, verbose=False)   # warm-up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        model.yolo(batch, verbose=False)
+    elapsed = time.perf_counter() - start
+    return batch_size * rounds / elapsed
+
+
+def bench_engine(model, images, batch_size, rounds, max_wait_ms):
+    engine = BatchingEngine(model, max_batch_size=batch_size, max_wait_ms=max_wait_ms)
+    total = batch_size * rounds
+    work = make_batch(images, total)
+    engine.predict_and_count(work[0])   # warm-up + start the batcher thread
+    with ThreadPoolExecutor(max_workers=batch_size) as pool:
+        start = time.perf_counter()
+        list(pool.map(engine.predict_and_count, work))
+        elapsed = time.perf_counter() - start
+    return total / elapsed
+
+
+def bench_tiled(model, images, tile_size, overlap, rounds):
+    tiles = sum(len(tile_grid(im.width, im.height, tile_size, overlap)) for im in images)
+    model.count_tiled(images[0], tile_size, overlap)   # warm-up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for image in images:
+            model.count_tiled(image, tile_size, overlap)
+    elapsed = time.perf_counter() - start
+    return tiles * rounds / elapsed, len(images) * rounds / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default=os.path.join("images", "2025", "09", "02"))
+    parser.add_argument("--model-path", default=None)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--max-wait-ms", type=float, default=20)
+    parser.add_argument("--limit", type=int, default=16, help="max reference images to load")
+    parser.add_argument("--tiled", action="store_true", help="benchmark sliced inference instead")
+    parser.add_argument("--tile-size", type=int, default=640)
+    parser.add_argument("--overlap", type=float, default=0.2)
+    args = parser.parse_args()
+
+    try:
+        import torch
+        print(f"torch threads: {torch.get_num_threads()}")
+    except ImportError:
+        pass
+
+    model = MyModel.get_model(args.model_path)
+
+    if args.tiled:
+        images = load_images(args.images, args.limit, max_size=TILED_INPUT_SIZE)
+        tiles_per_sec, images_per_sec = bench_tiled(model, images, args.tile_size, args.overlap, args.rounds)
+        print(f"tile {args.tile_size}px, overlap {args.overlap}: {tiles_per_sec:.2f} tiles/s, {images_per_sec:.2f} img/s")
+        raise SystemExit(0)
+
+    images = load_images(args.images, args.limit)
+
+    print(f"{'batch':>6} {'direct img/s':>14} {'engine img/s':>14}")
+    for size in args.batch_sizes:
+        direct = bench_direct(model, images, size, args.rounds)
+        engine = bench_engine(model, images, size, args.rounds, args.max_wait_ms)
+        print(f"{size:>6} {direct:>14.2f} {engine:>14.2f}")
@@ -0,0 +1,95 @@
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class ResultCache:
+    """Content-addressed LRU cache for inference results.
+
+    Keys are content hashes (e.g. "sha256:<hex>"), values anything JSON
+    serialisable. With `path` set, entries are also written through to a
+    small SQLite file so they survive restarts and are shared between
+    workers on the same host; the in-memory LRU stays the fast path.
+    """
+
+    def __init__(self, max_entries=10000, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(str(path), check_same_thread=False, timeout=5)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._db.commit()
+
+    # ----------------------------------------------------------
+    def _remember(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _lookup(self, key):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        if self._db is not None:
+            row = self._db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                value = json.loads(row[0])
+                self._remember(key, value)
+                return value
+        return None
+
+    # ----------------------------------------------------------
+    def get(self, *keys):
+        """Value for the first key that is cached, else None. Counts one hit or miss per call."""
+        with self._lock:
+            for key in keys:
+                if not key:
+                    continue
+                value = self._lookup(key)
+                if value is not None:
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def put(self, value, *keys):
+        with self._lock:
+            keys = [k for k in keys if k]
+            for key in keys:
+                self._remember(key, value)
+            if self._db is not None and keys:
+                encoded = json.dumps(value)
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO results (key, value) VALUES (?, ?)",
+                    [(key, encoded) for key in keys],
+                )
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+
+    # ----------------------------------------------------------
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "persistent": self._db is not None,
+            }
@@ -0,0 +1,112 @@
+"""Compact, storable detection results.
+
+A detection set is an (N, 6) float32 array: x1, y1, x2, y2 in image-relative
+(0..1) coordinates, confidence, class id. Every box the model returned above
+a low floor (HEADCOUNT_KEEP_CONF) is kept, whatever its class, so counts can
+be recomputed later under another threshold or counting rule without
+running the model again. Relative coordinates do not depend on the
+resolution the image was decoded at, so the boxes can be drawn on a
+thumbnail or the full-size original alike.
+
+Packed form: one header byte (the column count), then the rows as
+little-endian float16, i.e. 12 bytes per box.
+"""
+import os
+
+import numpy as np
+from PIL import ImageDraw, ImageFont
+
+COLUMNS = 6
+X1, Y1, X2, Y2, CONF, CLS = range(COLUMNS)
+EMPTY = np.zeros((0, COLUMNS), dtype=np.float32)
+DTYPE = np.dtype("<f2")
+
+
+PERSON = "person"
+_person_class = None   # resolved from the loaded model's class names, see counting_rule
+
+
+def counting_rule(names=None):
+    """(person class id, confidence threshold) a box needs to count as a head.
+
+    The one place live inference, labeled images and `manage.py recount_heads`
+    all take it from. HEADCOUNT_PERSON_CLASS overrides the class id; otherwise
+    it is the class named "person" in `names` (the model's id -> name map,
+    passed when the model loads). Callers without the model get the id the
+    model in this process resolved, or 0 (COCO's person) if none is loaded.
+    """
+    global _person_class
+    conf = float(os.environ.get("HEADCOUNT_CONF", "0.25"))
+    if os.environ.get("HEADCOUNT_PERSON_CLASS"):
+        return int(os.environ["HEADCOUNT_PERSON_CLASS"]), conf
+    if names is not None:
+        matches = [index for index, name in names.items() if name == PERSON]
+        if not matches:
+            raise ValueError(f"Model has no '{PERSON}' class, set HEADCOUNT_PERSON_CLASS to the class to count")
+        _person_class = matches[0]
+    return (_person_class if _person_class is not None else 0), conf
+
+
+def pack(detections):
+    return bytes([COLUMNS]) + np.ascontiguousarray(detections, dtype=DTYPE).tobytes()
+
+
+def unpack(blob):
+    if not blob:
+        return EMPTY
+    blob = bytes(blob)
+    return np.frombuffer(blob, dtype=DTYPE, offset=1).astype(np.float32).reshape(-1, blob[0])
+
+
+def from_boxes(xyxy, conf, cls, width, height):
+    """Detections from pixel xyxy boxes in an image of width x height."""
+    xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4) / np.array([width, height, width, height], dtype=np.float32)
+    return np.concatenate([
+        np.clip(xyxy, 0, 1),
+        np.asarray(conf, dtype=np.float32).reshape(-1, 1),
+        np.asarray(cls, dtype=np.float32).reshape(-1, 1),
+    ], axis=1)
+
+
+# ----------------------------------------------------------
+def select(detections, person_class, conf):
+    return detections[(detections[:, CLS] == person_class) & (detections[:, CONF] >= conf)]
+
+
+def count(detections, person_class, conf):
+    return int(((detections[:, CLS] == person_class) & (detections[:, CONF] >= conf)).sum())
+
+
+def count_packed(blobs, person_class, conf):
+    """Counts for many packed blobs at once: one concatenated array, one mask, one bincount.
+
+    Returns (counts, total boxes). Empty / missing blobs count as 0.
+    """
+    rows = []
+    for blob in blobs:
+        rows.append((len(blob) - 1) // (COLUMNS * DTYPE.itemsize) if blob else 0)
+    lengths = np.array(rows, dtype=np.int64)
+    if not lengths.sum():
+        return np.zeros(len(lengths), dtype=np.int64), 0
+
+    data = b"".join(bytes(blob)[1:] for blob in blobs if blob)
+    boxes = np.frombuffer(data, dtype=DTYPE).reshape(-1, COLUMNS)
+    owner = np.repeat(np.arange(len(lengths)), lengths)
+    mask = (boxes[:, CLS] == person_class) & (boxes[:, CONF] >= conf)
+    return np.bincount(owner[mask], minlength=len(lengths)), len(boxes)
+
+
+# ----------------------------------------------------------
+def draw(image, detections, person_class, conf, label="person"):
+    """Draw the counted boxes onto `image` (in place) and return it."""
+    detections = select(detections, person_class, conf)
+    scale = np.array([image.width, image.height, image.width, image.height], dtype=np.float32)
+    coords = (detections[:, :4] * scale).tolist()
+
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default()
+    width = max(1, round(max(image.size) / 500))   # keep boxes visible on big images, thin on thumbnails
+    for x1, y1, x2, y2 in coords:
+        draw.rectangle((x1, y1, x2, y2), outline="green", width=width)
+        draw.text((x1, y1), label, fill="red", font=font, stroke_width=1)
+    return image
@@ -0,0 +1,80 @@
+import glob
+import os
+import shutil
+import time
+
+from PIL import Image
+
+from .main import BACKENDS, MyModel, weights_path
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+
+
+# ----------------------------------------------------------
+def export_weights(backend, imgsz=640, source=None, **kwargs):
+    """Export the PyTorch weights to `backend` format and move them next to the .pt file."""
+    if backend == "torch":
+        raise ValueError("torch is the source format, nothing to export")
+    source = source or weights_path("torch")
+    target = weights_path(backend)
+
+    torch_model = MyModel(source, backend="torch")
+    # dynamic axes so the batching engine can send any batch size
+    exported = torch_model.yolo.export(format=backend, imgsz=imgsz, dynamic=True, **kwargs)
+    exported = str(exported)
+
+    if os.path.abspath(exported) != os.path.abspath(target):
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        elif os.path.exists(target):
+            os.remove(target)
+        shutil.move(exported, target)
+    return target
+
+
+# ----------------------------------------------------------
+def find_images(folder, limit=None):
+    paths = []
+    for pattern in IMAGE_PATTERNS:
+        paths.extend(glob.glob(os.path.join(folder, "**", pattern), recursive=True))
+    paths.sort()
+    return paths[:limit] if limit else paths
+
+
+def time_counts(model, paths, warmup=1):
+    """Counts per image and mean seconds per image for a model."""
+    images = [Image.open(p).convert("RGB") for p in paths]
+    for image in images[:warmup]:
+        model.predict_and_count(image)
+
+    counts = []
+    start = time.perf_counter()
+    for image in images:
+        counts.append(model.predict_and_count(image))
+    elapsed = time.perf_counter() - start
+    return counts, elapsed / max(len(images), 1)
+
+
+def compare_models(reference, candidate, paths):
+    """Run both models over `paths` and report count agreement and latency."""
+    ref_counts, ref_latency = time_counts(reference, paths)
+    cand_counts, cand_latency = time_counts(candidate, paths)
+
+    rows = [
+        {"image": path, "reference": r, "candidate": c, "diff": c - r}
+        for path, r, c in zip(paths, ref_counts, cand_counts)
+    ]
+    errors = [abs(row["diff"]) for row in rows]
+    return {
+        "rows": rows,
+        "mismatches": sum(1 for e in errors if e),
+        "mean_abs_error": sum(errors) / len(errors) if errors else 0.0,
+        "reference_latency": ref_latency,
+        "candidate_latency": cand_latency,
+        "speedup": ref_latency / cand_latency if cand_latency else 0.0,
+    }
+
+
+def export_formats():
+    # int8 weights come from quantize_model, not a plain export
+    return [b for b in BACKENDS if b != "torch" and not b.endswith("-int8")]
@@ -0,0 +1,49 @@
+import hashlib
+import io
+import os
+
+from PIL import Image
+
+# Longest side the detector looks at; YOLO letterboxes to this anyway, so
+# decoding anything bigger is wasted work and memory.
+INPUT_SIZE = int(os.environ.get("HEADCOUNT_IMGSZ", "640"))
+# Tiled (sliced) inference wants the detail back, but still caps the decode
+TILED_INPUT_SIZE = int(os.environ.get("HEADCOUNT_TILED_IMGSZ", "2560"))
+
+
+def load_image(source, max_size=None):
+    """Decode a path, bytes or file-like object straight to model resolution.
+
+    JPEGs use libjpeg's DCT scaling (draft mode), so a 12 MP phone photo is
+    decoded at 1/2, 1/4 or 1/8 size instead of being fully materialised and
+    then shrunk. Other formats are decoded normally and downscaled.
+    """
+    max_size = max_size or INPUT_SIZE
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    elif hasattr(source, "seek"):
+        source.seek(0)
+
+    image = Image.open(source)
+    if image.format == "JPEG":
+        image.draft("RGB", (max_size, max_size))
+    image = image.convert("RGB")
+    if max(image.size) > max_size:
+        image.thumbnail((max_size, max_size), Image.BILINEAR)
+
+    if hasattr(source, "seek"):
+        source.seek(0)   # leave uploads rewound for whoever stores them
+    return image
+
+
+def content_digest(fileobj, chunk_size=1 << 20):
+    """sha256 hex digest of a file-like object, read in chunks."""
+    digest = hashlib.sha256()
+    chunks = fileobj.chunks(chunk_size) if hasattr(fileobj, "chunks") else iter(lambda: fileobj.read(chunk_size), b"")
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+    for chunk in chunks:
+        digest.update(chunk)
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+    return digest.hexdigest()
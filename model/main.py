@@ -1,66 +1,289 @@
 import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
 from ultralytics import YOLO
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
 import numpy as np
+from .detections import count as count_detections, counting_rule, draw as draw_detections, from_boxes
+from .ingest import INPUT_SIZE, TILED_INPUT_SIZE, load_image
+from .tiling import batched_nms, tile_grid
+
+WEIGHTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "model_weights"))
+WEIGHTS_NAME = "First_head_count_model"
+
+# Inference backends and where their weights live (exported with `manage.py export_model`).
+# Ultralytics picks the runtime from the weights format: .pt -> PyTorch,
+# .onnx -> onnxruntime, *_openvino_model/ -> OpenVINO.
+BACKENDS = {
+    "torch": ".pt",
+    "onnx": ".onnx",
+    "onnx-int8": "_int8.onnx",   # written by `manage.py quantize_model`
+    "openvino": "_openvino_model",
+}
+
+
+def to_numpy(values):
+    # Ultralytics hands back torch tensors (possibly on GPU); plain arrays pass straight through
+    if hasattr(values, "cpu"):
+        values = values.cpu().numpy()
+    return np.asarray(values)
+
+
+def weights_path(backend="torch"):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {sorted(BACKENDS)}")
+    return os.path.join(WEIGHTS_DIR, WEIGHTS_NAME + BACKENDS[backend])
+
 
 class MyModel:
     _instance = None
+    _instance_lock = threading.Lock()
 
     # ----------------------------------------------------------
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, backend=None):
         if not hasattr(self, "yolo"):
+            self.backend = backend or os.environ.get("HEADCOUNT_BACKEND", "torch")
             if model_path is None:
-                model_path = os.path.join(os.path.dirname(__file__), "..", "model_weights", "First_head_count_model.pt")
-                model_path = os.path.abspath(model_path)
-            self.yolo = YOLO(model_path)
+                model_path = weights_path(self.backend)
+            self.model_path = model_path
+            self.yolo = YOLO(model_path, task="detect")
+
+            # resolved once here instead of on every count; by name unless HEADCOUNT_PERSON_CLASS says otherwise
+            self.person_class, self.conf = counting_rule(self.yolo.names)
+            if self.person_class not in self.yolo.names:
+                raise ValueError(f"HEADCOUNT_PERSON_CLASS={self.person_class} is not a class of {model_path}")
+            # every box down to this confidence is kept with the result (model.detections), so counts
+            # can be redone later at another threshold without running the model again
+            self.keep_conf = min(self.conf, float(os.environ.get("HEADCOUNT_KEEP_CONF", "0.05")))
 
     # ----------------------------------------------------------
     @classmethod
-    def get_model(cls, model_path=None):
+    def get_model(cls, model_path=None, backend=None):
         if cls._instance is None:
-            cls._instance = MyModel(model_path)
+            with cls._instance_lock:   # inference worker threads may race for the first load
+                if cls._instance is None:
+                    cls._instance = MyModel(model_path, backend)
         return cls._instance
 
+    # ----------------------------------------------------------
+    def warmup(self, batch_sizes=None):
+        # first forward passes pay for lazy init / allocator growth; do it on blank frames, not a user's photo
+        if batch_sizes is None:
+            batch_sizes = (1, int(os.environ.get("HEADCOUNT_MAX_BATCH", "8")))
+        blank = Image.new("RGB", (INPUT_SIZE, INPUT_SIZE), (114, 114, 114))
+        for size in batch_sizes:
+            self.predict_and_count_many([blank] * size)
+
+    # ----------------------------------------------------------
+    def get_engine(self):
+        # one shared micro-batcher per model instance
+        if getattr(self, "_engine", None) is None:
+            self._engine = BatchingEngine(self)
+        return self._engine
+
+    # ----------------------------------------------------------
+    def class_index(self, name):
+        for index, tag in self.yolo.names.items():
+            if tag == name:
+                return index
+        raise ValueError(f"Model has no '{name}' class")
+
     # ----------------------------------------------------------
     def predict_and_count(self, image):
         if isinstance(image, str):
-            image = Image.open(image)
+            image = load_image(image)
 
-        results = self.yolo(image)[0]
+        results = self.yolo(image, conf=self.keep_conf)[0]
         return self.count_persons(results)
 
+    # ----------------------------------------------------------
+    def predict_and_count_many(self, images):
+        return [count for count, _ in self.detect_many(images)]
+
+    def detect_many(self, images):
+        # one YOLO call for the whole list; (count, detections) per image
+        images = [load_image(image) if isinstance(image, str) else image for image in images]
+        if not images:
+            return []
+        results = self.yolo(images, conf=self.keep_conf, verbose=False)
+        return [self.count_and_detections(r) for r in results]
+
+    # ----------------------------------------------------------
+    def predict_tiled(self, image, tile_size=640, overlap=0.2, iou=0.5):
+        """Sliced inference for big, crowded photos.
+
+        Runs the detector on overlapping tile_size windows (batched), plus one
+        pass over the whole image for people larger than a tile, and merges
+        everything with class-aware NMS. Returns (xyxy, conf, cls) arrays in
+        image coordinates.
+        """
+        if isinstance(image, str):
+            image = load_image(image, max_size=TILED_INPUT_SIZE)
+
+        windows = tile_grid(image.width, image.height, tile_size, overlap)
+        batch_size = int(os.environ.get("HEADCOUNT_MAX_BATCH", "8"))
+        boxes, scores, classes = [], [], []
+
+        def collect(result, dx=0, dy=0):
+            boxes.append(to_numpy(result.boxes.xyxy).reshape(-1, 4) + np.array([dx, dy, dx, dy], dtype=np.float32))
+            scores.append(to_numpy(result.boxes.conf).reshape(-1))
+            classes.append(to_numpy(result.boxes.cls).reshape(-1))
+
+        for start in range(0, len(windows), batch_size):
+            chunk = windows[start:start + batch_size]
+            results = self.yolo([image.crop(w) for w in chunk], imgsz=tile_size, conf=self.keep_conf, verbose=False)
+            for (x0, y0, _, _), result in zip(chunk, results):
+                collect(result, x0, y0)
+        if len(windows) > 1:
+            collect(self.yolo(image, conf=self.keep_conf, verbose=False)[0])
+
+        boxes, scores, classes = np.concatenate(boxes), np.concatenate(scores), np.concatenate(classes)
+        keep = batched_nms(boxes, scores, classes, iou)
+        return boxes[keep], scores[keep], classes[keep]
+
+    def detect_tiled(self, image, tile_size=640, overlap=0.2):
+        # (count, detections) for one image, like detect_many
+        if isinstance(image, str):
+            image = load_image(image, max_size=TILED_INPUT_SIZE)
+        boxes, scores, classes = self.predict_tiled(image, tile_size, overlap)
+        detections = from_boxes(boxes, scores, classes, image.width, image.height)
+        return count_detections(detections, self.person_class, self.conf), detections
+
+    def count_tiled(self, image, tile_size=640, overlap=0.2, conf=None):
+        _, detections = self.detect_tiled(image, tile_size, overlap)
+        return count_detections(detections, self.person_class, self.conf if conf is None else conf)
+
     # ----------------------------------------------------------
     def predict_and_label(self, image, show_image=False):
         if isinstance(image, str):
-            image = Image.open(image)
+            image = load_image(image)
 
-        results = self.yolo(image)[0]
+        results = self.yolo(image, conf=self.keep_conf)[0]
         labeled_image = self.label_images(image, results, show_image=show_image)
         return labeled_image
 
     # ----------------------------------------------------------
     def label_images(self, image, results, show_image=False):
-        draw = ImageDraw.Draw(image)
-        font = ImageFont.load_default()
-
-        for box in results.boxes:
-            cls_index = int(box.cls[0].numpy())
-            tag = results.names[cls_index]
-            if tag == "person":
-                coords = box.xyxy.squeeze().numpy()  # [x1, y1, x2, y2]
-                draw.rectangle(coords, outline="green", width=2)
-                draw.text((coords[0], coords[1]), tag, fill="red", font=font, stroke_width=1)
-
+        draw_detections(image, self.detections(results), self.person_class, self.conf)
         if show_image:
             image.show()
         return image
 
     # ----------------------------------------------------------
-    def count_persons(self, results):
-        # Find the class index for "person"
-        person_class_index = [k for k, v in results.names.items() if v == "person"][0]
-        person_count = (results.boxes.cls == person_class_index).sum().item()
-        return person_count
+    def person_mask(self, results, conf=None):
+        # boolean mask over results.boxes: person class and above the confidence threshold
+        boxes = results.boxes
+        mask = to_numpy(boxes.cls) == self.person_class
+        conf = self.conf if conf is None else conf
+        if conf:
+            mask &= to_numpy(boxes.conf) >= conf
+        return mask
+
+    def count_persons(self, results, conf=None):
+        return int(self.person_mask(results, conf).sum())
+
+    def detections(self, results):
+        # every box in the result, in the stored form (see model.detections)
+        boxes = results.boxes
+        return np.concatenate([
+            to_numpy(boxes.xyxyn).reshape(-1, 4),
+            to_numpy(boxes.conf).reshape(-1, 1),
+            to_numpy(boxes.cls).reshape(-1, 1),
+        ], axis=1).astype(np.float32)
+
+    def count_and_detections(self, results):
+        return self.count_persons(results), self.detections(results)
+
+
+class BatchingEngine:
+    """Gathers concurrent predict_and_count calls into a single YOLO call.
+
+    Callers block on their own Future; a background thread waits for up to
+    `max_wait_ms` (or until `max_batch_size` images are queued) and then runs
+    one forward pass for the whole batch. Jobs submitted with `tiling`
+    (tile_size, overlap) go through detect_tiled instead, on the same thread,
+    so every YOLO call in the process is serialised here.
+
+    Futures resolve to (count, detections), see model.detections.
+    """
+
+    def __init__(self, model, max_batch_size=None, max_wait_ms=None):
+        self.model = model
+        self.max_batch_size = max_batch_size or int(os.environ.get("HEADCOUNT_MAX_BATCH", "8"))
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else float(os.environ.get("HEADCOUNT_MAX_WAIT_MS", "20"))) / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # ----------------------------------------------------------
+    def submit(self, image, tiling=None):
+        future = Future()
+        self._ensure_thread()
+        self._queue.put((image, tiling, future))
+        return future
+
+    def detect(self, image, tiling=None, timeout=None):
+        return self.submit(image, tiling).result(timeout=timeout)
+
+    def predict_and_count(self, image, tiling=None, timeout=None):
+        return self.detect(image, tiling, timeout)[0]
+
+    # ----------------------------------------------------------
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="headcount-batcher", daemon=True)
+                self._thread.start()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = [job for job in self._next_batch() if job[2].set_running_or_notify_cancel()]
+            plain = [(image, future) for image, tiling, future in batch if tiling is None]
+            tiled = [job for job in batch if job[1] is not None]
+
+            # a bad image only fails its own caller, never the rest of the batch
+            decoded = []
+            for image, future in plain:
+                try:
+                    decoded.append((load_image(image) if isinstance(image, str) else image, future))
+                except Exception as exc:
+                    future.set_exception(exc)
+
+            if decoded:
+                try:
+                    results = self.model.detect_many([image for image, _ in decoded])
+                except Exception:
+                    # find the culprit: one forward pass per image
+                    for image, future in decoded:
+                        try:
+                            future.set_result(self.model.detect_many([image])[0])
+                        except Exception as exc:
+                            future.set_exception(exc)
+                else:
+                    for (_, future), result in zip(decoded, results):
+                        future.set_result(result)
+
+            # tiles of one image already make a batch on their own
+            for image, (tile_size, overlap), future in tiled:
+                try:
+                    future.set_result(self.model.detect_tiled(image, tile_size, overlap))
+                except Exception as exc:
+                    future.set_exception(exc)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from .main import weights_path
+
+QUANTIZE_MODES = ("dynamic", "static")
+
+
+# ----------------------------------------------------------
+def letterbox(image, imgsz=640):
+    """Resize/pad a PIL image the way Ultralytics does and return a 1x3xHxW float32 array."""
+    image = image.convert("RGB")
+    scale = min(imgsz / image.width, imgsz / image.height)
+    resized = image.resize((round(image.width * scale), round(image.height * scale)), Image.BILINEAR)
+    canvas = Image.new("RGB", (imgsz, imgsz), (114, 114, 114))
+    canvas.paste(resized, ((imgsz - resized.width) // 2, (imgsz - resized.height) // 2))
+    array = np.asarray(canvas, dtype=np.float32) / 255.0
+    return array.transpose(2, 0, 1)[None]
+
+
+def _calibration_reader(paths, input_name, imgsz):
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class ImageCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self._paths = iter(paths)
+
+        def get_next(self):
+            for path in self._paths:
+                try:
+                    with Image.open(path) as image:
+                        return {input_name: letterbox(image, imgsz)}
+                except OSError:   # unreadable / missing file, skip it
+                    continue
+            return None
+
+    return ImageCalibrationReader()
+
+
+# ----------------------------------------------------------
+def quantize_onnx(mode="static", calibration_paths=(), imgsz=640, source=None, target=None):
+    """Write an INT8 copy of the exported ONNX weights.
+
+    `dynamic` only quantizes weights and needs no data; `static` also
+    quantizes activations using ranges observed on `calibration_paths`.
+    """
+    import onnx
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    if mode not in QUANTIZE_MODES:
+        raise ValueError(f"Unknown quantization mode '{mode}'")
+    source = source or weights_path("onnx")
+    target = target or weights_path("onnx-int8")
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"{source} not found, run `manage.py export_model --format onnx` first")
+
+    prepared = target + ".prep.onnx"
+    quant_pre_process(source, prepared)
+    try:
+        if mode == "dynamic":
+            quantize_dynamic(prepared, target, weight_type=QuantType.QInt8)
+        else:
+            if not calibration_paths:
+                raise ValueError("static quantization needs calibration images")
+            input_name = onnx.load(prepared).graph.input[0].name
+            quantize_static(
+                prepared,
+                target,
+                _calibration_reader(list(calibration_paths), input_name, imgsz),
+                quant_format=QuantFormat.QDQ,
+                per_channel=True,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+            )
+    finally:
+        if os.path.exists(prepared):
+            os.remove(prepared)
+    return target
+
+
+def weights_size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+    return os.path.getsize(path)
@@ -0,0 +1,73 @@
+"""Worker side of `manage.py reinfer_archive`.
+
+Runs in pool processes, so it never touches Django: jobs come in as
+(upload id, image path, tiling) tuples and results go back as
+(upload id, count, packed detections, error).
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from .detections import pack
+from .ingest import TILED_INPUT_SIZE, load_image
+
+_model = None
+_decoder = None
+
+
+def init_worker(model_path=None, backend=None, threads=1):
+    """Pool initializer: pin the thread count, then load one model for this process."""
+    global _model, _decoder
+    # must be set before torch / onnxruntime start their thread pools
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    from .main import MyModel
+    _model = MyModel.get_model(model_path, backend)
+    _model.warmup()
+    # decode the next images while the model is busy with the current batch
+    _decoder = ThreadPoolExecutor(max_workers=2, thread_name_prefix="reinfer-decode")
+
+
+def _decode(job):
+    upload_id, path, tiling = job
+    try:
+        return upload_id, load_image(path, max_size=TILED_INPUT_SIZE if tiling else None), tiling, None
+    except Exception as exc:
+        return upload_id, None, tiling, f"decode: {exc}"
+
+
+def process_chunk(jobs, batch_size=8):
+    results = []
+    batch = []
+
+    def flush():
+        try:
+            outputs = _model.detect_many([image for _, image in batch])
+        except Exception as exc:
+            results.extend((upload_id, None, None, str(exc)) for upload_id, _ in batch)
+        else:
+            results.extend((upload_id, count, pack(detections), None) for (upload_id, _), (count, detections) in zip(batch, outputs))
+        batch.clear()
+
+    # map() keeps decoding ahead of us, in order
+    for upload_id, image, tiling, error in _decoder.map(_decode, jobs):
+        if error:
+            results.append((upload_id, None, None, error))
+        elif tiling:
+            try:
+                count, detections = _model.detect_tiled(image, *tiling)
+                results.append((upload_id, count, pack(detections), None))
+            except Exception as exc:
+                results.append((upload_id, None, None, str(exc)))
+        else:
+            batch.append((upload_id, image))
+            if len(batch) >= batch_size:
+                flush()
+    if batch:
+        flush()
+    return results
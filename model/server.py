@@ -0,0 +1,208 @@
+"""Standalone inference daemon and its client.
+
+One process owns MyModel and serves many web workers over a Unix socket.
+Web workers decode the image themselves and copy the pixels once into a
+shared-memory block they own; only a small JSON header travels over the
+socket. The server maps the same block as a numpy array and feeds it to the
+model without copying, so web workers never import torch or hold weights.
+
+Protocol, one JSON object per line in each direction:
+
+    -> {"shm": "<block name>", "shape": [h, w, 3], "tiling": null | [tile_size, overlap]}
+    <- {"count": 12, "detections": "<base64 of model.detections.pack()>"} | {"error": "..."}
+"""
+import base64
+import atexit
+import itertools
+import json
+import os
+import socket
+import socketserver
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+from PIL import Image
+
+from .detections import pack, unpack
+from .ingest import TILED_INPUT_SIZE, load_image
+
+
+def attach_shared_memory(name):
+    # the client owns (and unlinks) the block; stop our resource tracker from claiming it too
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:   # Python < 3.13
+        block = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(block._name, "shared_memory")
+        return block
+
+
+_unreleased = []
+_unreleased_lock = threading.Lock()
+
+
+def release_shared_memory(block=None):
+    # Ultralytics keeps its last batch alive on the predictor, so a view into a block can
+    # outlive the request; park such blocks and retry until nothing references them.
+    with _unreleased_lock:
+        if block is not None:
+            _unreleased.append(block)
+        for pending in list(_unreleased):
+            try:
+                pending.close()
+            except BufferError:
+                continue
+            _unreleased.remove(pending)
+
+
+# ----------------------------------------------------------
+class InferenceRequestHandler(socketserver.StreamRequestHandler):
+
+    def setup(self):
+        super().setup()
+        self.block = None   # clients reuse one block per connection, so map it once
+
+    def finish(self):
+        if self.block is not None:
+            release_shared_memory(self.block)
+        super().finish()
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                count, detections = self.detect(json.loads(line))
+                reply = {"count": count, "detections": base64.b64encode(pack(detections)).decode()}
+            except Exception as exc:
+                reply = {"error": str(exc)}
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+            self.wfile.flush()
+
+    def detect(self, header):
+        if self.block is None or self.block.name.lstrip("/") != header["shm"].lstrip("/"):
+            if self.block is not None:
+                release_shared_memory(self.block)
+            self.block = attach_shared_memory(header["shm"])
+
+        bgr = np.ndarray(tuple(header["shape"]), dtype=np.uint8, buffer=self.block.buf)
+        tiling = header.get("tiling")
+        if tiling:
+            # slicing crops PIL images, so tiled jobs take one copy
+            return self.server.engine.detect(Image.fromarray(bgr[..., ::-1]), tuple(tiling))
+        return self.server.engine.detect(bgr)
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, model):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.engine = model.get_engine()   # every connection thread feeds the same batcher
+        super().__init__(socket_path, InferenceRequestHandler)
+        os.chmod(socket_path, 0o660)
+
+
+# ----------------------------------------------------------
+class RemoteModel:
+    """Client side: same detect / predict_and_count / submit calls as BatchingEngine.
+
+    `socket_paths` is one path or a comma-separated list of daemons to spread
+    requests over. Each thread keeps its own connection and shared-memory
+    block, grown as needed, so steady-state requests allocate nothing.
+    """
+
+    def __init__(self, socket_paths, timeout=60):
+        if isinstance(socket_paths, str):
+            socket_paths = [p.strip() for p in socket_paths.split(",") if p.strip()]
+        self.socket_paths = socket_paths
+        self.timeout = timeout
+        self._next_path = itertools.cycle(socket_paths)
+        self._local = threading.local()
+        self._blocks = set()
+        self._blocks_lock = threading.Lock()
+        self._pool = None
+        atexit.register(self.close)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(next(self._next_path))
+            conn = self._local.conn = (sock, sock.makefile("rwb"))
+        return conn
+
+    def _disconnect(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            conn[1].close()
+            conn[0].close()
+
+    def _block(self, size):
+        block = getattr(self._local, "block", None)
+        if block is None or block.size < size:
+            if block is not None:
+                self._free(block)
+            block = self._local.block = shared_memory.SharedMemory(create=True, size=size)
+            with self._blocks_lock:
+                self._blocks.add(block)
+        return block
+
+    def _free(self, block):
+        with self._blocks_lock:
+            self._blocks.discard(block)
+        block.close()
+        block.unlink()
+
+    def close(self):
+        # unlink every block we created, including ones owned by threads that are gone
+        with self._blocks_lock:
+            blocks, self._blocks = self._blocks, set()
+        for block in blocks:
+            try:
+                block.close()
+                block.unlink()
+            except (BufferError, OSError):
+                pass
+
+    # ----------------------------------------------------------
+    def predict_and_count(self, image, tiling=None):
+        return self.detect(image, tiling)[0]
+
+    def detect(self, image, tiling=None):
+        if isinstance(image, str):
+            image = load_image(image, max_size=TILED_INPUT_SIZE if tiling else None)
+        rgb = np.asarray(image.convert("RGB"))
+
+        block = self._block(rgb.nbytes)
+        np.ndarray(rgb.shape, dtype=np.uint8, buffer=block.buf)[...] = rgb[..., ::-1]   # model wants BGR
+        header = {"shm": block.name, "shape": list(rgb.shape), "tiling": list(tiling) if tiling else None}
+
+        for attempt in range(2):   # reconnect once if the daemon was restarted
+            try:
+                _, stream = self._connection()
+                stream.write(json.dumps(header).encode() + b"\n")
+                stream.flush()
+                line = stream.readline()
+                if not line:
+                    raise ConnectionError("inference server closed the connection")
+                break
+            except OSError:
+                self._disconnect()
+                if attempt:
+                    raise
+
+        reply = json.loads(line)
+        if "error" in reply:
+            raise RuntimeError(f"inference server: {reply['error']}")
+        return reply["count"], unpack(base64.b64decode(reply["detections"]))
+
+    def submit(self, image, tiling=None):
+        # several requests in flight at once (one connection each) so the daemon can batch them
+        with self._blocks_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="headcount-remote")
+        return self._pool.submit(self.detect, image, tiling)
@@ -0,0 +1,50 @@
+import numpy as np
+
+
+def tile_grid(width, height, tile_size, overlap):
+    """(x0, y0, x1, y1) windows of tile_size covering the image, overlapping by `overlap` (fraction)."""
+    if tile_size < 1 or not 0 <= overlap < 1:
+        raise ValueError(f"Bad tiling: tile_size={tile_size}, overlap={overlap}")
+    step = max(int(tile_size * (1 - overlap)), 1)
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        points = list(range(0, length - tile_size, step))
+        points.append(length - tile_size)   # last tile flush with the edge
+        return points
+
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in starts(height)
+        for x in starts(width)
+    ]
+
+
+def nms(boxes, scores, iou_threshold=0.5):
+    """Greedy non-maximum suppression, vectorised per kept box. Returns kept indices."""
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def batched_nms(boxes, scores, classes, iou_threshold=0.5):
+    # shift each class into its own coordinate range so one NMS pass never merges across classes
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = classes[:, None] * (boxes.max() + 1)
+    return nms(boxes + offsets, scores, iou_threshold)